@@ -0,0 +1,257 @@
+import json
+import multiprocessing as mp
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+# --- Análise offline de vídeos gravados ---
+# Cada vídeo é dividido em blocos de DURACAO_BLOCO segundos, decodificados em paralelo por um
+# pool de processos; cada bloco devolve as emoções detectadas nos frames amostrados. Depois a
+# mesma MaquinaPersistencia do loop ao vivo percorre as detecções em ordem, e os eventos
+# confirmados são gravados com o horário original da gravação.
+EXTENSOES_VIDEO = ('.mp4', '.avi', '.mkv', '.mov', '.webm', '.m4v')
+AMOSTRAGEM_PADRAO = 2.0  # detecções por segundo de vídeo
+DURACAO_BLOCO = 30.0
+
+def listar_videos(caminho):
+    if os.path.isdir(caminho):
+        return sorted(
+            os.path.join(caminho, nome) for nome in os.listdir(caminho)
+            if nome.lower().endswith(EXTENSOES_VIDEO)
+        )
+    return [caminho]
+
+def propriedades_video(caminho):
+    import cv2
+    cap = cv2.VideoCapture(caminho)
+    if not cap.isOpened():
+        raise ValueError(f'Não foi possível abrir o vídeo {caminho}.')
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return fps, total
+
+# Inicializador dos processos do pool: carrega e aquece o modelo uma vez por processo
+def _aquecer():
+    from deteccao import aquecer_detector
+    aquecer_detector()
+
+# Executado no pool: decodifica os frames [inicio, fim) e classifica um a cada `passo`.
+# Retorna ([(segundos desde o início do vídeo, humor ou None), ...], frames decodificados).
+def analisar_bloco(caminho, inicio, fim, fps, passo):
+    import cv2
+    from deteccao import detectar_emocao
+    cap = cv2.VideoCapture(caminho)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, inicio)
+    deteccoes = []
+    lidos = 0
+    for indice in range(inicio, fim):
+        if indice % passo:
+            # grab() avança sem converter o frame, bem mais barato que read()
+            if not cap.grab():
+                break
+        else:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            deteccoes.append((indice / fps, detectar_emocao(frame)))
+        lidos += 1
+    cap.release()
+    return deteccoes, lidos
+
+class TrabalhoAnalise:
+    def __init__(self, caminho, user_id, amostragem=AMOSTRAGEM_PADRAO, inicio=None, processos=None):
+        self.id = uuid.uuid4().hex
+        self.caminho = caminho
+        self.user_id = user_id
+        self.amostragem = amostragem
+        self.inicio = inicio  # datetime do começo da gravação (só para um arquivo)
+        self.processos = processos or mp.cpu_count()
+        self.estado = 'pendente'  # pendente | executando | concluido | erro
+        self.erro = None
+        self.videos = []
+        self.frames_total = 0
+        self.frames_processados = 0
+        self.deteccoes = 0
+        self.eventos = 0
+        self.criado_em = time.time()
+        self.iniciado_em = None
+        self.concluido_em = None
+        self.arquivo_estado = None  # onde salvar() grava o status (ver TrabalhosAnalise)
+        self._salvo_em = 0.0
+
+    def status(self):
+        fim = self.concluido_em or time.time()
+        decorrido = fim - self.iniciado_em if self.iniciado_em else 0.0
+        return {
+            'id': self.id,
+            'caminho': self.caminho,
+            'user_id': self.user_id,
+            'estado': self.estado,
+            'erro': self.erro,
+            'videos': self.videos,
+            'amostragem_fps': self.amostragem,
+            'processos': self.processos,
+            'frames_total': self.frames_total,
+            'frames_processados': self.frames_processados,
+            'progresso_pct': round(100.0 * self.frames_processados / self.frames_total, 1) if self.frames_total else 0.0,
+            'fps': round(self.frames_processados / decorrido, 1) if decorrido > 0 else 0.0,
+            'deteccoes': self.deteccoes,
+            'eventos': self.eventos,
+            'decorrido_s': round(decorrido, 2),
+            'criado_em': self.criado_em,
+        }
+
+    # Grava o status em arquivo_estado para que os outros processos da API o leiam; `minimo`
+    # limita a frequência durante a execução
+    def salvar(self, minimo=0.0):
+        if self.arquivo_estado is None or time.time() - self._salvo_em < minimo:
+            return
+        self._salvo_em = time.time()
+        temporario = f"{self.arquivo_estado}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(dict(self.status(), pid=os.getpid()), arquivo, ensure_ascii=False)
+        os.replace(temporario, self.arquivo_estado)
+
+    # gravar_eventos(lote) recebe dicts no formato de HumorEvent (ver gravar_eventos_humor)
+    def executar(self, gravar_eventos):
+        from deteccao import MaquinaPersistencia
+        self.estado = 'executando'
+        self.iniciado_em = time.time()
+        self.salvar()
+        try:
+            videos = listar_videos(self.caminho)
+            if not videos:
+                raise ValueError('Nenhum vídeo encontrado.')
+            if self.inicio is not None and len(videos) > 1:
+                raise ValueError('O horário de início só pode ser informado para um único arquivo.')
+            planos = []
+            for video in videos:
+                fps, total = propriedades_video(video)
+                planos.append((video, fps, total))
+                self.frames_total += total
+            self.videos = [os.path.basename(v) for v, _, _ in planos]
+
+            contexto = mp.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=self.processos, mp_context=contexto, initializer=_aquecer) as pool:
+                for video, fps, total in planos:
+                    passo = max(1, round(fps / self.amostragem))
+                    tamanho = max(passo, int(DURACAO_BLOCO * fps))
+                    futuros = {
+                        pool.submit(analisar_bloco, video, inicio, min(total, inicio + tamanho), fps, passo): inicio
+                        for inicio in range(0, total, tamanho)
+                    }
+                    blocos = {}
+                    for futuro in as_completed(futuros):
+                        deteccoes, lidos = futuro.result()
+                        blocos[futuros[futuro]] = deteccoes
+                        self.frames_processados += lidos
+                        self.deteccoes += sum(1 for _, humor in deteccoes if humor is not None)
+                        self.salvar(minimo=1.0)
+
+                    # Gravação começou em `inicio` ou, sem ele, termina no mtime do arquivo
+                    if self.inicio is not None:
+                        comeco = self.inicio.timestamp()
+                    else:
+                        comeco = os.path.getmtime(video) - total / fps
+                    maquina = MaquinaPersistencia(inicio_tempo=comeco)
+                    lote = []
+                    for inicio in sorted(blocos):
+                        for segundos, humor in blocos[inicio]:
+                            if humor is None:
+                                continue
+                            confirmacao = maquina.registrar(humor, comeco + segundos)
+                            if confirmacao is not None and confirmacao[1] is not None:
+                                humor_atual, humor_anterior, duracao = confirmacao
+                                lote.append({
+                                    'data_hora': datetime.fromtimestamp(comeco + segundos),
+                                    'humor': humor_atual,
+                                    'mudanca': humor_anterior,
+                                    'duracao': duracao,
+                                    'user_id': self.user_id,
+                                })
+                    if lote:
+                        gravar_eventos(lote)
+                    self.eventos += len(lote)
+            self.estado = 'concluido'
+        except Exception as e:
+            self.estado = 'erro'
+            self.erro = str(e)
+            print(f"[ERRO] Análise {self.id}: {str(e)}")
+        finally:
+            self.concluido_em = time.time()
+            self.salvar()
+        return self
+
+# --- Trabalhos de análise disparados pela API ---
+# Cada trabalho roda numa thread própria que coordena o seu pool de processos. O status fica
+# em <pasta>/<id>.json, então qualquer worker WSGI responde por ele, não só o que o criou.
+class TrabalhosAnalise:
+    def __init__(self, gravar_eventos, pasta, max_guardados=100):
+        self._gravar_eventos = gravar_eventos
+        self.pasta = pasta
+        self._max_guardados = max_guardados
+        self._lock = threading.Lock()
+        self._trabalhos = {}  # só os que estão rodando neste processo
+
+    def _caminho(self, trabalho_id):
+        if not trabalho_id or not all(c in '0123456789abcdef' for c in trabalho_id):
+            return None
+        return os.path.join(self.pasta, f'{trabalho_id}.json')
+
+    def criar(self, caminho, user_id, **opcoes):
+        os.makedirs(self.pasta, exist_ok=True)
+        trabalho = TrabalhoAnalise(caminho, user_id, **opcoes)
+        trabalho.arquivo_estado = self._caminho(trabalho.id)
+        trabalho.salvar()
+        with self._lock:
+            self._trabalhos = {i: t for i, t in self._trabalhos.items() if t.estado not in ('concluido', 'erro')}
+            self._trabalhos[trabalho.id] = trabalho
+        self._esquecer_antigos()
+        threading.Thread(target=trabalho.executar, args=(self._gravar_eventos,),
+                         name=f"analise-{trabalho.id[:8]}", daemon=True).start()
+        return trabalho
+
+    # Status salvo por qualquer processo; um trabalho cujo processo morreu aparece como erro
+    def _ler(self, caminho):
+        with open(caminho, encoding='utf-8') as arquivo:
+            status = json.load(arquivo)
+        pid = status.pop('pid', None)
+        if status['estado'] in ('pendente', 'executando') and pid is not None:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                status.update(estado='erro', erro='O processo da análise terminou antes de concluir.')
+            except PermissionError:
+                pass
+        return status
+
+    def obter(self, trabalho_id):
+        trabalho = self._trabalhos.get(trabalho_id)
+        if trabalho is not None:
+            return trabalho.status()
+        caminho = self._caminho(trabalho_id)
+        try:
+            return self._ler(caminho) if caminho else None
+        except (OSError, ValueError):
+            return None
+
+    def listar(self):
+        if not os.path.isdir(self.pasta):
+            return []
+        # obter() devolve None para arquivos apagados ou sendo substituídos neste instante
+        lista = [self.obter(nome[:-len('.json')]) for nome in os.listdir(self.pasta) if nome.endswith('.json')]
+        return sorted((st for st in lista if st is not None), key=lambda st: st['criado_em'])
+
+    # Esquece os trabalhos terminados mais antigos
+    def _esquecer_antigos(self):
+        lista = self.listar()
+        terminados = [st for st in lista if st['estado'] in ('concluido', 'erro')]
+        for antigo in terminados[:max(0, len(lista) - self._max_guardados)]:
+            try:
+                os.remove(self._caminho(antigo['id']))
+            except OSError:
+                pass
@@ -0,0 +1,270 @@
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from werkzeug.security import safe_join
+
+from estado import versao_conteudo
+
+MetadadosArquivo = namedtuple('MetadadosArquivo', 'caminho tamanho mtime mtime_ns etag mimetype')
+
+def hash_arquivo(caminho, bloco=1024 * 1024):
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for pedaco in iter(lambda: arquivo.read(bloco), b''):
+            sha.update(pedaco)
+    return sha.hexdigest()
+
+# --- Cache de metadados dos arquivos servidos em /uploads ---
+# Guarda tamanho, mtime, tipo MIME e um ETag forte (SHA-256 do conteúdo, calculado uma vez).
+# A entrada só é conferida no disco (os.stat) depois de `ttl` segundos.
+class CacheMetadados:
+    def __init__(self, pasta, ttl=2.0):
+        self.pasta = pasta
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entradas = {}
+
+    def obter(self, filename):
+        caminho = safe_join(self.pasta, filename)
+        if caminho is None:
+            return None
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(filename)
+        if entrada is not None and agora - entrada[1] < self.ttl:
+            return entrada[0]
+
+        try:
+            st = os.stat(caminho)
+        except OSError:
+            self.invalidar(filename)
+            return None
+        if not os.path.isfile(caminho):
+            return None
+
+        metadados = entrada[0] if entrada is not None else None
+        if metadados is None or (metadados.tamanho, metadados.mtime_ns) != (st.st_size, st.st_mtime_ns):
+            mime_type, _ = mimetypes.guess_type(caminho)
+            metadados = MetadadosArquivo(
+                caminho=caminho,
+                tamanho=st.st_size,
+                mtime=st.st_mtime,
+                mtime_ns=st.st_mtime_ns,
+                etag=hash_arquivo(caminho),
+                mimetype=mime_type or 'application/octet-stream',
+            )
+        with self._lock:
+            self._entradas[filename] = (metadados, agora)
+        return metadados
+
+    def invalidar(self, filename=None):
+        with self._lock:
+            if filename is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(filename, None)
+
+# --- Upload gravado direto no disco com hash calculado durante a escrita ---
+# Usado como destino do parser multipart do Werkzeug (ver RequisicaoUpload em Api.py):
+# cada pedaço recebido é escrito no arquivo temporário e somado ao SHA-256.
+class ArquivoComHash:
+    def __init__(self, pasta):
+        os.makedirs(pasta, exist_ok=True)
+        self._arquivo = tempfile.NamedTemporaryFile(dir=pasta, suffix='.part', delete=False)
+        self.caminho = self._arquivo.name
+        self.tamanho = 0
+        self._sha = hashlib.sha256()
+
+    def write(self, dados):
+        self._sha.update(dados)
+        self.tamanho += len(dados)
+        return self._arquivo.write(dados)
+
+    def hexdigest(self):
+        return self._sha.hexdigest()
+
+    def __getattr__(self, nome):
+        return getattr(self._arquivo, nome)
+
+    def descartar(self):
+        self._arquivo.close()
+        if os.path.exists(self.caminho):
+            os.remove(self.caminho)
+
+# --- Uploads retomáveis em pedaços (Wi-Fi instável) ---
+# Cada sessão é um arquivo <id>.part (o tamanho dele é o offset atual) e um <id>.json
+# com o tamanho total esperado. O cliente envia pedaços com Content-Range e, se cair,
+# consulta o offset e continua de onde parou.
+class SessoesUpload:
+    def __init__(self, pasta, validade=24 * 3600):
+        self.pasta = pasta
+        self.validade = validade
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    def _caminhos(self, upload_id):
+        if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+            raise KeyError(upload_id)
+        base = os.path.join(self.pasta, upload_id)
+        if not os.path.exists(base + '.json'):
+            raise KeyError(upload_id)
+        return base + '.part', base + '.json'
+
+    def _lock_sessao(self, upload_id):
+        with self._lock:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def criar(self, tamanho_total):
+        self.limpar_expiradas()
+        os.makedirs(self.pasta, exist_ok=True)
+        upload_id = uuid.uuid4().hex
+        base = os.path.join(self.pasta, upload_id)
+        open(base + '.part', 'wb').close()
+        with open(base + '.json', 'w') as arquivo:
+            json.dump({'tamanho_total': tamanho_total, 'criado_em': time.time()}, arquivo)
+        return upload_id
+
+    def estado(self, upload_id):
+        parte, meta = self._caminhos(upload_id)
+        with open(meta) as arquivo:
+            tamanho_total = json.load(arquivo)['tamanho_total']
+        return {'upload_id': upload_id, 'offset': os.path.getsize(parte), 'tamanho_total': tamanho_total}
+
+    # Anexa o corpo a partir de `inicio`; retorna o novo offset. ValueError se o offset não bater.
+    def anexar(self, upload_id, inicio, stream, bloco=64 * 1024):
+        parte, _ = self._caminhos(upload_id)
+        with self._lock_sessao(upload_id):
+            estado = self.estado(upload_id)
+            if inicio != estado['offset']:
+                raise ValueError(estado['offset'])
+            restante = estado['tamanho_total'] - estado['offset']
+            with open(parte, 'ab') as arquivo:
+                for pedaco in iter(lambda: stream.read(bloco), b''):
+                    if len(pedaco) > restante:
+                        raise OverflowError(estado['tamanho_total'])
+                    arquivo.write(pedaco)
+                    restante -= len(pedaco)
+            return os.path.getsize(parte)
+
+    # Sessão completa -> (caminho do .part, sha256, tamanho). O .part passa a ser de quem chamou.
+    def concluir(self, upload_id):
+        parte, meta = self._caminhos(upload_id)
+        with self._lock_sessao(upload_id):
+            estado = self.estado(upload_id)
+            if estado['offset'] != estado['tamanho_total']:
+                raise ValueError(estado['offset'])
+            sha = hash_arquivo(parte)
+            os.remove(meta)
+        with self._lock:
+            self._locks.pop(upload_id, None)
+        return parte, sha, estado['tamanho_total']
+
+    def limpar_expiradas(self):
+        if not os.path.isdir(self.pasta):
+            return
+        limite = time.time() - self.validade
+        for nome in os.listdir(self.pasta):
+            caminho = os.path.join(self.pasta, nome)
+            try:
+                if os.path.getmtime(caminho) < limite:
+                    os.remove(caminho)
+            except OSError:
+                pass
+
+# --- Índice em memória da pasta de uploads ---
+# Montado uma vez na inicialização e atualizado pelas rotas de upload/remoção; as listagens
+# leem só a lista já ordenada. Mudanças feitas por fora (cópia manual, outro processo) são
+# detectadas pela reconciliação periódica, que compara o mtime da pasta. A versão vem da lista
+# de arquivos (nome, tamanho, mtime), então workers que enxergam a mesma pasta concordam nela.
+class IndiceUploads:
+    def __init__(self, pasta, intervalo_reconciliacao=30.0):
+        self.pasta = pasta
+        self.intervalo_reconciliacao = intervalo_reconciliacao
+        self.versao = 0
+        self._lock = threading.Lock()
+        self._arquivos = {}
+        self._ordenados = []
+        self._mtime_pasta = None
+        self._thread = None
+
+    def _varrer(self):
+        arquivos = {}
+        mtime_pasta = os.stat(self.pasta).st_mtime_ns
+        with os.scandir(self.pasta) as entradas:
+            for entrada in entradas:
+                if entrada.name.startswith('.') or not entrada.is_file():
+                    continue
+                st = entrada.stat()
+                arquivos[entrada.name] = (st.st_size, st.st_mtime)
+        return arquivos, mtime_pasta
+
+    def _publicar(self, arquivos, mtime_pasta=None):
+        self._arquivos = arquivos
+        self._ordenados = sorted(arquivos)
+        if mtime_pasta is not None:
+            self._mtime_pasta = mtime_pasta
+        self.versao = versao_conteudo([[nome, *arquivos[nome]] for nome in self._ordenados])
+
+    def construir(self):
+        arquivos, mtime_pasta = self._varrer()
+        with self._lock:
+            self._publicar(arquivos, mtime_pasta)
+
+    def iniciar(self):
+        self.construir()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop_reconciliacao, name="indice-uploads", daemon=True)
+            self._thread.start()
+
+    def _loop_reconciliacao(self):
+        while True:
+            time.sleep(self.intervalo_reconciliacao)
+            try:
+                self.reconciliar()
+            except OSError as e:
+                print(f"[ERRO] Reconciliação do índice de uploads: {str(e)}")
+
+    def reconciliar(self):
+        if os.stat(self.pasta).st_mtime_ns == self._mtime_pasta:
+            return False
+        arquivos, mtime_pasta = self._varrer()
+        with self._lock:
+            if arquivos != self._arquivos:
+                self._publicar(arquivos, mtime_pasta)
+            else:
+                self._mtime_pasta = mtime_pasta
+        return True
+
+    def adicionar(self, nome):
+        caminho = os.path.join(self.pasta, nome)
+        st = os.stat(caminho)
+        with self._lock:
+            arquivos = dict(self._arquivos)
+            arquivos[nome] = (st.st_size, st.st_mtime)
+            self._publicar(arquivos, os.stat(self.pasta).st_mtime_ns)
+
+    def remover(self, nome):
+        with self._lock:
+            if nome not in self._arquivos:
+                return
+            arquivos = dict(self._arquivos)
+            del arquivos[nome]
+            self._publicar(arquivos, os.stat(self.pasta).st_mtime_ns)
+
+    def contem(self, nome):
+        return nome in self._arquivos
+
+    # Retorna (versao, total, nomes) da página pedida
+    def pagina(self, offset=0, limite=None):
+        with self._lock:
+            ordenados = self._ordenados
+            versao = self.versao
+        fim = len(ordenados) if limite is None else offset + limite
+        return versao, len(ordenados), ordenados[offset:fim]
@@ -0,0 +1,238 @@
+# --- Benchmark reproduzível do pipeline de detecção ---
+#
+# Passa um vídeo gravado (ou uma pasta de imagens) pelo mesmo caminho do loop ao vivo
+# (leitura -> JPEG -> rastreamento -> filtro -> inferência -> persistência), usando o tempo do
+# vídeo como relógio, e grava um JSON com frames/s, latência p50/p95/p99 por etapa, CPU, RSS e
+# a comparação dos eventos confirmados com um gabarito.
+#
+#     python benchmark.py gravacoes/sessao.mp4 --gabarito sessao.json --saida resultado.json
+#     python benchmark.py frames/ --fps-imagens 10 --backend onnx --scale 0.4
+#
+# Gabarito: lista JSON de {"t": segundos desde o início, "humor": "happy"} (ou {"eventos": [...]}).
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import deteccao
+from video import QUALIDADES, codificar_jpeg
+
+EXTENSOES_IMAGEM = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def ler_frames(caminho, fps_imagens, tempos, max_frames=None):
+    # Gera (segundos desde o início, frame) e mede a etapa de leitura/decodificação
+    if os.path.isdir(caminho):
+        nomes = sorted(n for n in os.listdir(caminho) if n.lower().endswith(EXTENSOES_IMAGEM))
+        for indice, nome in enumerate(nomes[:max_frames]):
+            inicio = time.perf_counter()
+            frame = cv2.imread(os.path.join(caminho, nome))
+            tempos.setdefault('leitura', []).append(time.perf_counter() - inicio)
+            if frame is not None:
+                yield indice / fps_imagens, frame
+        return
+
+    cap = cv2.VideoCapture(caminho)
+    if not cap.isOpened():
+        raise SystemExit(f'[ERRO] Não foi possível abrir {caminho}.')
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    indice = 0
+    while max_frames is None or indice < max_frames:
+        inicio = time.perf_counter()
+        ok, frame = cap.read()
+        if not ok:
+            break
+        tempos.setdefault('leitura', []).append(time.perf_counter() - inicio)
+        yield indice / fps, frame
+        indice += 1
+    cap.release()
+
+def percentis(amostras):
+    if not amostras:
+        return {'n': 0}
+    ms = np.array(amostras) * 1000.0
+    return {
+        'n': len(ms),
+        'media_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'max_ms': round(float(ms.max()), 3),
+    }
+
+def carregar_gabarito(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        dados = json.load(arquivo)
+    eventos = dados['eventos'] if isinstance(dados, dict) else dados
+    return sorted(({'t': float(e['t']), 'humor': e['humor']} for e in eventos), key=lambda e: e['t'])
+
+# Casa cada evento confirmado com o evento do gabarito de mesmo humor mais próximo dentro da
+# tolerância (cada evento do gabarito só pode ser usado uma vez).
+def comparar_eventos(confirmados, gabarito, tolerancia):
+    usados = set()
+    atrasos = []
+    for evento in confirmados:
+        candidatos = [
+            (abs(evento['t'] - g['t']), i) for i, g in enumerate(gabarito)
+            if i not in usados and g['humor'] == evento['humor'] and abs(evento['t'] - g['t']) <= tolerancia
+        ]
+        if candidatos:
+            _, i = min(candidatos)
+            usados.add(i)
+            atrasos.append(evento['t'] - gabarito[i]['t'])
+    vp = len(usados)
+    fp = len(confirmados) - vp
+    fn = len(gabarito) - vp
+    precisao = vp / (vp + fp) if vp + fp else 0.0
+    recall = vp / (vp + fn) if vp + fn else 0.0
+    return {
+        'gabarito': len(gabarito),
+        'verdadeiros_positivos': vp,
+        'falsos_positivos': fp,
+        'falsos_negativos': fn,
+        'precisao': round(precisao, 3),
+        'recall': round(recall, 3),
+        'f1': round(2 * precisao * recall / (precisao + recall), 3) if precisao + recall else 0.0,
+        'atraso_medio_s': round(float(np.mean(atrasos)), 3) if atrasos else None,
+        'tolerancia_s': tolerancia,
+    }
+
+def uso_recursos():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    uso = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {'user_s': uso.ru_utime, 'sys_s': uso.ru_stime, 'rss_max_mb': round(uso.ru_maxrss / divisor, 1)}
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def executar(args):
+    # As opções sobrescrevem a configuração do módulo antes de o detector ser criado
+    if args.scale is not None:
+        deteccao.PROCESS_SCALE = args.scale
+    if args.backend is not None:
+        deteccao.BACKEND = args.backend
+    if args.mtcnn is not None:
+        deteccao.USE_MTCNN = args.mtcnn
+    if args.sem_rastreamento:
+        deteccao.USE_TRACKING = False
+    if args.sem_filtro:
+        deteccao.USE_MOTION_GATE = False
+
+    aquecimento_ms = deteccao.aquecer_detector()
+    tempos = {}
+    pipeline = deteccao.PipelineDeteccao(0, inicio_tempo=0.0, tempos=tempos, verbose=False)
+    if args.todos_os_frames:
+        agendador = pipeline.agendador
+        agendador.intervalo_base = agendador.intervalo_pendente = agendador.intervalo_max = agendador.intervalo = 0.0
+
+    recursos_antes = uso_recursos()
+    inicio = time.perf_counter()
+    frames = 0
+    confirmados = []
+    duracao_video = 0.0
+    for segundos, frame in ler_frames(args.entrada, args.fps_imagens, tempos, args.max_frames):
+        inicio_frame = time.perf_counter()
+        if args.qualidade:
+            inicio_jpeg = time.perf_counter()
+            codificar_jpeg(frame, args.qualidade)
+            tempos.setdefault('codificacao', []).append(time.perf_counter() - inicio_jpeg)
+        evento = pipeline.processar(frame, segundos)
+        tempos.setdefault('total_frame', []).append(time.perf_counter() - inicio_frame)
+        if evento is not None:
+            confirmados.append({'t': round(segundos, 3), 'humor': evento['humor_atual'],
+                                'anterior': evento['humor_anterior'], 'duracao': evento['duracao']})
+        frames += 1
+        duracao_video = segundos
+    decorrido = time.perf_counter() - inicio
+    recursos_depois = uso_recursos()
+
+    resultado = {
+        'entrada': args.entrada,
+        'quando': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit_atual(),
+        'ambiente': {'python': platform.python_version(), 'opencv': cv2.__version__, 'maquina': platform.machine(),
+                     'nucleos': os.cpu_count()},
+        'config': {
+            'backend': deteccao.obter_detector().nome,  # o realmente usado, após um eventual fallback
+            'process_scale': deteccao.PROCESS_SCALE,
+            'use_mtcnn': deteccao.USE_MTCNN,
+            'use_tracking': deteccao.USE_TRACKING,
+            'use_motion_gate': deteccao.USE_MOTION_GATE,
+            'detection_interval': deteccao.DETECTION_INTERVAL,
+            'persistence_count': deteccao.PERSISTENCE_COUNT,
+            'todos_os_frames': args.todos_os_frames,
+            'qualidade_jpeg': args.qualidade,
+        },
+        'frames': frames,
+        'duracao_video_s': round(duracao_video, 3),
+        'decorrido_s': round(decorrido, 3),
+        'fps': round(frames / decorrido, 2) if decorrido else 0.0,
+        'tempo_real_x': round(duracao_video / decorrido, 2) if decorrido else 0.0,
+        'aquecimento_ms': aquecimento_ms,
+        'etapas': {etapa: percentis(amostras) for etapa, amostras in tempos.items()},
+        'contadores': {
+            'inferencias': len(tempos.get('inferencia', [])),
+            'avaliacoes_filtro': len(tempos.get('filtro', [])),
+        },
+        'eventos': {'confirmados': confirmados},
+    }
+    if recursos_antes and recursos_depois:
+        cpu = (recursos_depois['user_s'] - recursos_antes['user_s']) + (recursos_depois['sys_s'] - recursos_antes['sys_s'])
+        resultado['recursos'] = {
+            'cpu_s': round(cpu, 3),
+            'cpu_pct': round(100.0 * cpu / decorrido, 1) if decorrido else 0.0,
+            'rss_max_mb': recursos_depois['rss_max_mb'],
+        }
+    if args.gabarito:
+        resultado['eventos'].update(comparar_eventos(confirmados, carregar_gabarito(args.gabarito), args.tolerancia))
+    return resultado
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark do pipeline de detecção de emoções.')
+    parser.add_argument('entrada', help='Vídeo gravado ou pasta com uma sequência de imagens.')
+    parser.add_argument('--gabarito', help='JSON com os eventos esperados ({"t", "humor"}).')
+    parser.add_argument('--tolerancia', type=float, default=3.0, help='Distância máxima (s) para casar um evento com o gabarito.')
+    parser.add_argument('--saida', help='Arquivo JSON de saída (padrão: stdout).')
+    parser.add_argument('--fps-imagens', type=float, default=10.0, help='Taxa de quadros de uma pasta de imagens.')
+    parser.add_argument('--max-frames', type=int, default=None)
+    parser.add_argument('--qualidade', choices=list(QUALIDADES), default='media',
+                        help='Qualidade JPEG codificada por frame (como um cliente assistindo).')
+    parser.add_argument('--sem-jpeg', dest='qualidade', action='store_const', const=None)
+    parser.add_argument('--backend', default=None, help='Backend de inferência (fer, onnx).')
+    parser.add_argument('--scale', type=float, default=None, help='Sobrescreve PROCESS_SCALE.')
+    parser.add_argument('--mtcnn', dest='mtcnn', action='store_true', default=None)
+    parser.add_argument('--sem-mtcnn', dest='mtcnn', action='store_false')
+    parser.add_argument('--sem-rastreamento', action='store_true')
+    parser.add_argument('--sem-filtro', action='store_true')
+    parser.add_argument('--todos-os-frames', action='store_true', help='Ignora o agendador e detecta em todo frame.')
+    args = parser.parse_args(argv)
+
+    # Os logs do pipeline vão para stderr, para o stdout ficar só com o JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        resultado = executar(args)
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+        print(f"[OK] {resultado['frames']} frames a {resultado['fps']} fps; resultado em {args.saida}.")
+    else:
+        print(texto)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,438 @@
+# --- Teste de carga local da API ---
+#
+# Sobe a API contra um banco SQLite temporário já populado, com a detecção trocada por um
+# simulador (JPEGs prontos no canal de vídeo e emoções confirmadas publicadas no mural, como o
+# serviço `flask deteccao` faria), e dispara ao mesmo tempo ursos (ESP32) consultando o estado,
+# usuários do app (login, histórico, snapshot) e envios de música. No fim mostra, por rota,
+# requisições/s, latência p50/p95/p99 e a taxa de erros.
+#
+#     python carga.py --ursos 50 --usuarios-app 10 --uploaders 2 --duracao 60
+#     python carga.py --servidor gunicorn --workers 4 --threads 8 --saida carga.json
+#
+# --servidor flask: servidor de desenvolvimento com threads; gunicorn: vários workers WSGI.
+# Nos dois casos a API roda com DETECCAO_MODO=externo. Os clientes ficam em --processos
+# processos separados para o gerador de carga não virar o gargalo.
+
+import argparse
+import contextlib
+import http.client
+import json
+import multiprocessing as mp
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+PASTA_BACKEND = os.path.dirname(os.path.abspath(__file__))
+HUMORES = ['happy', 'sad', 'angry', 'neutral', 'surprise', 'fear']
+SENHA = 'carga123'
+PREFIXO_SEGMENTOS = 'dorotea_carga'
+
+def email_urso(indice):
+    return f'urso{indice}@carga.local'
+
+# --- Preparação: banco temporário e detecção simulada (processo principal) ---
+# O ambiente precisa estar definido antes de importar Api, porque o módulo lê a configuração
+# na importação; o servidor herda as mesmas variáveis.
+def configurar_ambiente(pasta):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(pasta, 'urso.db')
+    os.environ['DETECCAO_MODO'] = 'externo'
+    os.environ['DETECCAO_PREFIXO'] = PREFIXO_SEGMENTOS
+    os.environ['PYTHONPATH'] = os.pathsep.join(p for p in (PASTA_BACKEND, os.environ.get('PYTHONPATH')) if p)
+    os.chdir(pasta)  # uploads/, otimizados/ etc. são relativos ao diretório atual
+    if PASTA_BACKEND not in sys.path:
+        sys.path.insert(0, PASTA_BACKEND)
+
+def popular_banco(ursos, eventos_por_urso, dias=30):
+    from datetime import datetime, timedelta
+    from werkzeug.security import generate_password_hash
+    from flask_migrate import upgrade
+    import Api
+    with Api.app.app_context():
+        Api.obter_migrate()
+        upgrade()  # o banco temporário nasce vazio; as migrações criam as tabelas
+    Api.criar_app(iniciar_servicos=False)
+    senha_hash = generate_password_hash(SENHA)  # o mesmo hash para todos: popular fica rápido
+    with Api.app.app_context():
+        usuarios = []
+        for indice in range(1, ursos + 1):
+            codigo = f'URSO-CARGA-{indice:04d}'
+            Api.db.session.add(Api.CodigoUrso(codigo=codigo, usado=True))
+            usuario = Api.Usuario(nome_completo=f'Usuário de carga {indice}', email=email_urso(indice),
+                                  senha_hash=senha_hash, codigo_urso=codigo)
+            Api.db.session.add(usuario)
+            usuarios.append(usuario)
+        Api.db.session.commit()
+        ids = [usuario.id for usuario in usuarios]
+
+        # Histórico espalhado pelos últimos `dias` dias, para /eventos paginar sobre dados reais
+        passo = dias * 86400.0 / max(1, eventos_por_urso)
+        comeco = datetime.now() - timedelta(days=dias)
+        for user_id in ids:
+            anterior = None
+            linhas = []
+            for i in range(eventos_por_urso):
+                humor = random.choice([h for h in HUMORES if h != anterior])
+                linhas.append({'data_hora': comeco + timedelta(seconds=i * passo), 'humor': humor, 'mudanca': anterior,
+                               'duracao': round(passo, 2), 'user_id': user_id})
+                anterior = humor
+            if linhas:
+                Api.db.session.execute(Api.db.insert(Api.HumorEvent), linhas)
+        Api.db.session.commit()
+        Api.db.session.remove()
+    return ids
+
+def frame_sintetico(indice, largura=640, altura=480):
+    import cv2
+    import numpy as np
+    y, x = np.mgrid[0:altura, 0:largura]
+    frame = np.dstack([(x + 20 * indice) % 256, (y + 10 * indice) % 256, ((x + y) // 4) % 256]).astype(np.uint8)
+    cv2.circle(frame, (largura // 2 + 10 * indice, altura // 2), altura // 6, (200, 180, 160), -1)
+    return frame
+
+# Faz o papel dos processos de captura/inferência: publica JPEGs já codificados nas qualidades
+# que alguém está pedindo e, de vez em quando, confirma uma emoção nova (que vai para o banco
+# pela fila de escrita e para os workers da API pelo mural, como no serviço de detecção).
+class DeteccaoSimulada:
+    def __init__(self, ids, fps=10.0, trocas_por_minuto=2.0):
+        from memoria import nome_segmento
+        from video import QUALIDADES, CanalVideo, codificar_jpeg
+        self._qualidades = list(QUALIDADES)
+        self._canais = {user_id: CanalVideo(nome_segmento('video', user_id), criar=True) for user_id in ids}
+        frames = [frame_sintetico(i) for i in range(8)]
+        self._jpegs = {q: [codificar_jpeg(f, q) for f in frames] for q in self._qualidades}
+        self._fps = fps
+        self._chance_troca = trocas_por_minuto / 60.0 / fps
+        self._humores = {user_id: None for user_id in ids}
+        self._parar = threading.Event()
+        self._thread = None
+        self.eventos = 0
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._loop, name="deteccao-simulada", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        import Api
+        while not self._parar.is_set():
+            agora = time.time()
+            for user_id, canal in self._canais.items():
+                for qualidade in self._qualidades:
+                    if canal.demandado(qualidade, agora):
+                        canal.publicar(qualidade, random.choice(self._jpegs[qualidade]))
+                if random.random() < self._chance_troca:
+                    anterior = self._humores[user_id]
+                    humor = random.choice([h for h in HUMORES if h != anterior])
+                    self._humores[user_id] = humor
+                    if anterior is not None:
+                        Api.ao_evento_confirmado({'user_id': user_id, 'humor_atual': humor, 'humor_anterior': anterior,
+                                                  'duracao': 30.0, 'timestamp': agora})
+                        self.eventos += 1
+            self._parar.wait(1.0 / self._fps)
+
+    def encerrar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(5.0)
+        for canal in self._canais.values():
+            canal.fechar()
+
+# --- Servidor ---
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def iniciar_servidor(args, pasta, porta):
+    if args.servidor == 'flask':
+        comando = [sys.executable, '-m', 'flask', '--app', 'Api:criar_app()', 'run', '--host', '127.0.0.1', '--port', str(porta),
+                   '--with-threads', '--no-reload', '--no-debugger']
+    else:
+        comando = [sys.executable, '-m', 'gunicorn', '-w', str(args.workers), '--threads', str(args.threads),
+                   '-b', f'127.0.0.1:{porta}', '--pythonpath', PASTA_BACKEND, 'Api:criar_app()']
+    log = open(os.path.join(pasta, 'servidor.log'), 'w')
+    processo = subprocess.Popen(comando, cwd=pasta, env=os.environ.copy(), stdout=log, stderr=subprocess.STDOUT)
+    limite = time.time() + args.timeout_inicio
+    while time.time() < limite:
+        if processo.poll() is not None:
+            raise SystemExit(f'[ERRO] O servidor terminou ao iniciar (código {processo.returncode}); veja {log.name}.')
+        try:
+            conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=2)
+            conexao.request('GET', '/pronto')
+            if conexao.getresponse().status == 200:
+                return processo
+        except OSError:
+            pass
+        time.sleep(0.25)
+    processo.kill()
+    raise SystemExit(f'[ERRO] O servidor não ficou pronto em {args.timeout_inicio}s; veja {log.name}.')
+
+def parar_servidor(processo):
+    processo.terminate()
+    try:
+        processo.wait(10)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+
+# --- Clientes simulados (rodam nos processos do pool; não importam Api) ---
+class Cliente:
+    def __init__(self, porta, resultados):
+        self._porta = porta
+        self._conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+        self._resultados = resultados
+
+    # Retorna (status, corpo, cabeçalhos); status 0 = erro de conexão/timeout
+    def requisitar(self, rota, metodo, caminho, corpo=None, cabecalhos=None):
+        for tentativa in range(2):
+            reutilizada = self._conexao.sock is not None
+            inicio = time.perf_counter()
+            try:
+                self._conexao.request(metodo, caminho, body=corpo, headers=cabecalhos or {})
+                resposta = self._conexao.getresponse()
+                dados = resposta.read()
+                status, cabecalhos_resposta = resposta.status, dict(resposta.getheaders())
+                break
+            except (OSError, http.client.HTTPException) as e:
+                self._conexao.close()
+                status, dados, cabecalhos_resposta = 0, b'', {}
+                # O servidor fechou a conexão keep-alive ociosa (gunicorn: 2s); como qualquer
+                # cliente HTTP, tenta de novo numa conexão nova, e só isso não conta como erro
+                ociosa = isinstance(e, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+                if not (reutilizada and ociosa):
+                    break
+        self._resultados.append((rota, status, time.perf_counter() - inicio))
+        return status, dados, cabecalhos_resposta
+
+def _pausar(segundos, fim):
+    time.sleep(max(0.0, min(segundos * random.uniform(0.8, 1.2), fim - time.time())))
+
+# ESP32: consulta humor e música no intervalo de polling, com If-None-Match (304 quando nada mudou)
+def simular_urso(cliente, user_id, _email, opcoes, fim):
+    etags = {}
+    rotas = (('GET /ultima_emocao', f'/ultima_emocao?user_id={user_id}'),
+             ('GET /get_selected_music', f'/get_selected_music/{user_id}'))
+    while time.time() < fim:
+        for rota, caminho in rotas:
+            cabecalhos = {'If-None-Match': etags[rota]} if rota in etags else {}
+            _, _, resposta = cliente.requisitar(rota, 'GET', caminho, cabecalhos=cabecalhos)
+            if resposta.get('ETag'):
+                etags[rota] = resposta['ETag']
+        _pausar(opcoes['intervalo_urso'], fim)
+
+# App: login ao abrir, depois acompanha o humor, o histórico (às vezes a página seguinte) e a câmera
+def simular_app(cliente, user_id, email, opcoes, fim):
+    login = json.dumps({'email': email, 'senha': SENHA})
+    iteracao = 0
+    while time.time() < fim:
+        if iteracao % opcoes['iteracoes_sessao'] == 0:
+            cliente.requisitar('POST /login', 'POST', '/login', login, {'Content-Type': 'application/json'})
+        cliente.requisitar('GET /ultima_emocao', 'GET', f'/ultima_emocao?user_id={user_id}')
+        status, dados, _ = cliente.requisitar('GET /eventos', 'GET', f'/eventos?user_id={user_id}&limite=50')
+        if status == 200 and random.random() < 0.3:
+            cursor = json.loads(dados).get('proximo_cursor')
+            if cursor:
+                cliente.requisitar('GET /eventos', 'GET', f'/eventos?user_id={user_id}&limite=50&contar=0&cursor={cursor}')
+        cliente.requisitar('GET /snapshot', 'GET', f'/snapshot/{user_id}?qualidade=media')
+        iteracao += 1
+        _pausar(opcoes['intervalo_app'], fim)
+
+def _multipart(campos, nome_arquivo, conteudo):
+    fronteira = uuid.uuid4().hex
+    partes = []
+    for nome, valor in campos.items():
+        partes.append(f'--{fronteira}\r\nContent-Disposition: form-data; name="{nome}"\r\n\r\n{valor}\r\n'.encode())
+    partes.append(f'--{fronteira}\r\nContent-Disposition: form-data; name="file"; filename="{nome_arquivo}"\r\n'
+                  f'Content-Type: audio/mpeg\r\n\r\n'.encode() + conteudo + b'\r\n')
+    partes.append(f'--{fronteira}--\r\n'.encode())
+    return b''.join(partes), f'multipart/form-data; boundary={fronteira}'
+
+# Envio de música: arquivo novo a cada vez (conteúdo aleatório, então sem deduplicação)
+def simular_upload(cliente, _user_id, email, opcoes, fim):
+    while time.time() < fim:
+        titulo = uuid.uuid4().hex[:12]
+        corpo, tipo = _multipart({'email': email, 'title': titulo, 'artist': 'Carga'}, f'{titulo}.mp3',
+                                 os.urandom(opcoes['tamanho_upload_kb'] * 1024))
+        cliente.requisitar('POST /add_music', 'POST', '/add_music', corpo, {'Content-Type': tipo})
+        _pausar(opcoes['intervalo_upload'], fim)
+
+PERFIS = {
+    'urso': simular_urso,
+    'app': simular_app,
+    'upload': simular_upload,
+}
+
+# Executado no pool: uma thread por cliente simulado; retorna [(rota, status, segundos), ...]
+def executar_clientes(porta, clientes, opcoes, fim):
+    resultados = []
+
+    def rodar(perfil, user_id, email):
+        # Espalha as partidas para não começar com todos os clientes no mesmo instante
+        time.sleep(random.uniform(0, opcoes['rampa']))
+        PERFIS[perfil](Cliente(porta, resultados), user_id, email, opcoes, fim)
+
+    threads = [threading.Thread(target=rodar, args=cliente, daemon=True) for cliente in clientes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultados
+
+# --- Relatório ---
+def percentil(ordenadas, p):
+    return ordenadas[min(len(ordenadas) - 1, int(round(p / 100.0 * (len(ordenadas) - 1))))]
+
+def resumir(resultados, duracao):
+    por_rota = {}
+    for rota, status, segundos in resultados:
+        por_rota.setdefault(rota, []).append((status, segundos))
+    resumo = {}
+    for rota in sorted(por_rota):
+        amostras = por_rota[rota]
+        latencias = sorted(s * 1000.0 for _, s in amostras)
+        erros = sum(1 for status, _ in amostras if status == 0 or status >= 400)
+        resumo[rota] = {
+            'requisicoes': len(amostras),
+            'rps': round(len(amostras) / duracao, 1),
+            'erros': erros,
+            'erros_pct': round(100.0 * erros / len(amostras), 2),
+            'p50_ms': round(percentil(latencias, 50), 2),
+            'p95_ms': round(percentil(latencias, 95), 2),
+            'p99_ms': round(percentil(latencias, 99), 2),
+            'max_ms': round(latencias[-1], 2),
+            'status': dict(Counter(str(status) for status, _ in amostras)),
+        }
+    return resumo
+
+def imprimir_tabela(resumo):
+    print(f"{'rota':<26}{'req':>8}{'req/s':>9}{'erros%':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}  status")
+    for rota, r in resumo.items():
+        status = ' '.join(f'{s}:{n}' for s, n in sorted(r['status'].items()))
+        print(f"{rota:<26}{r['requisicoes']:>8}{r['rps']:>9}{r['erros_pct']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+              f"{r['p99_ms']:>9}{r['max_ms']:>9}  {status}")
+
+def executar(args):
+    pasta = tempfile.mkdtemp(prefix='dorotea_carga_')
+    configurar_ambiente(pasta)
+    print(f"[INFO] Banco temporário em {pasta}; {args.ursos} ursos com {args.eventos} eventos cada.")
+    ids = popular_banco(args.ursos, args.eventos)
+    usuarios = [(user_id, email_urso(i + 1)) for i, user_id in enumerate(ids)]
+
+    deteccao = DeteccaoSimulada(ids, args.fps, args.trocas_por_minuto)
+    porta = porta_livre()
+    servidor = iniciar_servidor(args, pasta, porta)
+    print(f"[OK] Servidor {args.servidor} pronto na porta {porta}.")
+    try:
+
+        clientes = [('urso', user_id, email) for user_id, email in usuarios]
+        clientes += [('app',) + usuarios[i % len(usuarios)] for i in range(args.usuarios_app)]
+        clientes += [('upload',) + usuarios[i % len(usuarios)] for i in range(args.uploaders)]
+        random.shuffle(clientes)
+        opcoes = {
+            'intervalo_urso': args.intervalo_urso,
+            'intervalo_app': args.intervalo_app,
+            'intervalo_upload': args.intervalo_upload,
+            'iteracoes_sessao': args.iteracoes_sessao,
+            'tamanho_upload_kb': args.tamanho_upload_kb,
+            'rampa': min(2.0, args.duracao / 4),
+        }
+        processos = max(1, min(args.processos, len(clientes)))
+        print(f"[INFO] {len(clientes)} clientes em {processos} processos por {args.duracao:g}s.")
+        # Os logs da gravação dos eventos simulados vão para um arquivo, não para o relatório
+        with open(os.path.join(pasta, 'deteccao.log'), 'w') as log, contextlib.redirect_stdout(log):
+            import Api
+            deteccao.iniciar()
+            inicio = time.time()
+            fim = inicio + args.duracao
+            resultados = []
+            try:
+                with ProcessPoolExecutor(max_workers=processos, mp_context=mp.get_context('spawn')) as pool:
+                    futuros = [pool.submit(executar_clientes, porta, clientes[i::processos], opcoes, fim)
+                               for i in range(processos)]
+                    for futuro in futuros:
+                        resultados.extend(futuro.result())
+                duracao = time.time() - inicio
+            finally:
+                deteccao.encerrar()
+                Api.fila_eventos_humor.encerrar()
+    finally:
+        parar_servidor(servidor)
+
+    resumo = resumir(resultados, duracao)
+    total = len(resultados)
+    erros = sum(r['erros'] for r in resumo.values())
+    return pasta, {
+        'quando': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {
+            'servidor': args.servidor,
+            'workers': args.workers if args.servidor == 'gunicorn' else 1,
+            'threads': args.threads if args.servidor == 'gunicorn' else None,
+            'ursos': args.ursos,
+            'usuarios_app': args.usuarios_app,
+            'uploaders': args.uploaders,
+            'eventos_por_urso': args.eventos,
+            'intervalo_urso_s': args.intervalo_urso,
+            'intervalo_app_s': args.intervalo_app,
+            'intervalo_upload_s': args.intervalo_upload,
+            'tamanho_upload_kb': args.tamanho_upload_kb,
+            'processos_clientes': processos,
+            'nucleos': os.cpu_count(),
+        },
+        'duracao_s': round(duracao, 2),
+        'requisicoes': total,
+        'rps': round(total / duracao, 1),
+        'erros_pct': round(100.0 * erros / total, 2) if total else 0.0,
+        'eventos_simulados': deteccao.eventos,
+        'rotas': resumo,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Teste de carga local da API (banco temporário, detecção simulada).')
+    parser.add_argument('--servidor', choices=['flask', 'gunicorn'], default='flask')
+    parser.add_argument('--workers', type=int, default=4, help='Workers do gunicorn.')
+    parser.add_argument('--threads', type=int, default=8, help='Threads por worker do gunicorn.')
+    parser.add_argument('--ursos', type=int, default=50, help='Ursos (ESP32) fazendo polling; cada um é um usuário.')
+    parser.add_argument('--usuarios-app', type=int, default=10)
+    parser.add_argument('--uploaders', type=int, default=2)
+    parser.add_argument('--duracao', type=float, default=30.0, help='Segundos de carga.')
+    parser.add_argument('--intervalo-urso', type=float, default=1.0, help='Intervalo de polling do ESP32 (s).')
+    parser.add_argument('--intervalo-app', type=float, default=2.0, help='Pausa entre as ações de um usuário do app (s).')
+    parser.add_argument('--intervalo-upload', type=float, default=5.0, help='Pausa entre envios de música (s).')
+    parser.add_argument('--iteracoes-sessao', type=int, default=20, help='Ações do app entre dois logins.')
+    parser.add_argument('--tamanho-upload-kb', type=int, default=256)
+    parser.add_argument('--eventos', type=int, default=2000, help='Eventos de humor no histórico de cada urso.')
+    parser.add_argument('--fps', type=float, default=10.0, help='Frames/s da câmera simulada.')
+    parser.add_argument('--trocas-por-minuto', type=float, default=2.0, help='Emoções confirmadas por urso por minuto.')
+    parser.add_argument('--processos', type=int, default=max(1, min(4, (os.cpu_count() or 2) // 2)),
+                        help='Processos que geram a carga.')
+    parser.add_argument('--timeout-inicio', type=float, default=60.0)
+    parser.add_argument('--saida', help='Arquivo JSON com o resultado completo.')
+    parser.add_argument('--manter', action='store_true', help='Não apaga a pasta temporária (banco, uploads, log do servidor).')
+    args = parser.parse_args(argv)
+    if args.saida:
+        args.saida = os.path.abspath(args.saida)  # executar() muda para a pasta temporária
+
+    pasta, resultado = executar(args)
+    print()
+    imprimir_tabela(resultado['rotas'])
+    print(f"\n[OK] {resultado['requisicoes']} requisições em {resultado['duracao_s']}s "
+          f"({resultado['rps']} req/s, {resultado['erros_pct']}% de erros).")
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+            arquivo.write('\n')
+        print(f"[OK] Resultado em {args.saida}.")
+    if args.manter:
+        print(f"[INFO] Pasta temporária mantida em {pasta}.")
+    else:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,528 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from inferencia import BACKEND_PADRAO, criar_backend
+from memoria import AnelFrames
+from metricas import PASTA_PERFIS, PERFIL_HABILITADO, AmostradorPerfil, MetricasDeteccao
+from supervisor import CONTADORES
+from video import CanalVideo, publicar_frame
+
+# --- Configuração da detecção ---
+PROCESS_SCALE = 0.5
+BACKEND = BACKEND_PADRAO
+USE_MTCNN = True  # só vale para o backend FER
+DETECTION_INTERVAL = 1.0
+PERSISTENCE_COUNT = 3
+# Agendamento adaptativo: amostra mais rápido enquanto uma emoção aguarda confirmação e
+# espaça as detecções enquanto o humor confirmado segue estável.
+PENDING_DETECTION_INTERVAL = 0.4
+MAX_STABLE_DETECTION_INTERVAL = 4.0
+STABLE_BACKOFF = 1.5
+# Detectar e rastrear: o detector do backend (MTCNN ou YuNet) localiza o rosto a cada REDETECTION_INTERVAL segundos e um
+# rastreador OpenCV acompanha a caixa entre as detecções; só o recorte do rosto vai para o classificador.
+USE_TRACKING = True
+REDETECTION_INTERVAL = 5.0
+FACE_MARGIN = 0.25
+# Filtro barato antes da inferência: pula o classificador quando a cena não mudou (diferença de frames em
+# escala de cinza reduzida) ou quando o Haar não encontra nada parecido com um rosto.
+USE_MOTION_GATE = True
+USE_HAAR_GATE = True
+GATE_PIXEL_THRESHOLD = 25
+GATE_CHANGED_FRACTION = 0.02
+GATE_MAX_SKIP_SECONDS = 30.0
+# Menor rosto (px) procurado pelo Haar, no frame já reduzido por PROCESS_SCALE
+GATE_MIN_FACE = 20
+
+# O detector é criado somente dentro do processo de inferência, no aquecimento
+# (aquecer_detector). Este módulo nem é importado pelo processo da API.
+# O backend (FER ou ONNX Runtime) vem de DETECCAO_BACKEND; ver inferencia.py.
+_detector = None
+# Métricas do worker (MetricasDeteccao sobre o Array compartilhado com a API), definidas pelos
+# loops de captura/inferência; None no benchmark e na análise offline.
+_metricas = None
+
+def _observar(nome, inicio):
+    if _metricas is not None:
+        _metricas.observar(nome, time.perf_counter() - inicio)
+
+def obter_detector():
+    global _detector
+    if _detector is None:
+        opcoes = {'mtcnn': USE_MTCNN} if BACKEND == 'fer' else {}
+        try:
+            _detector = criar_backend(BACKEND, **opcoes)
+        except Exception as e:
+            if BACKEND == 'fer':
+                raise
+            print(f"[ERRO] Backend de inferência '{BACKEND}' indisponível ({str(e)}); usando FER.")
+            _detector = criar_backend('fer', mtcnn=USE_MTCNN)
+        print(f"[INFO] Backend de inferência: {_detector.nome}.")
+    return _detector
+
+# Aquecimento explícito: carrega o modelo e roda uma inferência num frame vazio, porque a primeira
+# chamada (TensorFlow ou ONNX Runtime) monta o grafo e é muito mais lenta que as seguintes. Retorna o tempo em ms.
+def aquecer_detector():
+    inicio = time.time()
+    obter_detector().detect_emotions(np.zeros((240, 320, 3), dtype=np.uint8))
+    return int((time.time() - inicio) * 1000)
+
+# --- Funções de Humor ---
+def _emocao_principal(deteccao):
+    emocao, _ = max(deteccao["emotions"].items(), key=lambda i: i[1])
+    return emocao
+
+# agora: instante do frame no relógio de quem chama (tempo do clipe no benchmark); padrão time.time()
+def detectar_emocao(frame, rastreador=None, agora=None):
+    inicio = time.perf_counter()
+    small = cv2.resize(frame, (0, 0), fx=PROCESS_SCALE, fy=PROCESS_SCALE)
+    _observar('redimensionamento', inicio)
+    inicio = time.perf_counter()
+    if rastreador is not None:
+        humor = rastreador.detectar(small, time.time() if agora is None else agora)
+        _observar('inferencia', inicio)
+        return humor
+    detections = obter_detector().detect_emotions(small)
+    _observar('inferencia', inicio)
+    if not detections:
+        return None
+    return _emocao_principal(detections[0])
+
+def _criar_tracker():
+    # KCF é o mais leve; MIL existe também no pacote opencv-python sem os módulos contrib
+    for nome in ('TrackerKCF_create', 'TrackerMIL_create'):
+        for modulo in (cv2, getattr(cv2, 'legacy', None)):
+            fabrica = getattr(modulo, nome, None)
+            if fabrica is not None:
+                return fabrica()
+    return None
+
+# --- Rastreamento do rosto entre detecções completas ---
+# Trabalha sempre no frame já reduzido por PROCESS_SCALE.
+class RastreadorFace:
+    def __init__(self, intervalo_redeteccao=REDETECTION_INTERVAL, margem=FACE_MARGIN):
+        self.intervalo_redeteccao = intervalo_redeteccao
+        self.margem = margem
+        self.deteccoes_completas = 0
+        self.deteccoes_rastreadas = 0
+        self._tracker = None
+        self._caixa = None
+        self._ultima_deteccao = 0.0
+
+    def _reiniciar(self, small, caixa, agora):
+        x, y, w, h = (int(v) for v in caixa)
+        self._tracker = _criar_tracker()
+        if self._tracker is None:
+            return
+        self._tracker.init(small, (x, y, w, h))
+        self._caixa = (x, y, w, h)
+        self._ultima_deteccao = agora
+
+    def _descartar(self):
+        self._tracker = None
+        self._caixa = None
+
+    # Chamado a cada frame consumido para o rastreador não perder o rosto entre detecções
+    def acompanhar(self, frame):
+        if self._tracker is None:
+            return
+        small = cv2.resize(frame, (0, 0), fx=PROCESS_SCALE, fy=PROCESS_SCALE)
+        ok, caixa = self._tracker.update(small)
+        if not ok or caixa[2] < 8 or caixa[3] < 8:
+            self._descartar()
+            return
+        self._caixa = tuple(int(v) for v in caixa)
+
+    # agora vem do frame (não do relógio da máquina), para a janela de redetecção ser a mesma
+    # em qualquer host e num replay do benchmark
+    def detectar(self, small, agora):
+        if self._caixa is not None and agora - self._ultima_deteccao < self.intervalo_redeteccao:
+            emocao = self._classificar_recorte(small)
+            if emocao is not None:
+                self.deteccoes_rastreadas += 1
+                return emocao
+
+        self.deteccoes_completas += 1
+        detections = obter_detector().detect_emotions(small)
+        if not detections:
+            self._descartar()
+            return None
+        self._reiniciar(small, detections[0]["box"], agora)
+        return _emocao_principal(detections[0])
+
+    def _classificar_recorte(self, small):
+        x, y, w, h = self._caixa
+        altura, largura = small.shape[:2]
+        mx, my = int(w * self.margem), int(h * self.margem)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(largura, x + w + mx), min(altura, y + h + my)
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return None
+        recorte = small[y0:y1, x0:x1]
+        # Com face_rectangles o backend pula a detecção de rosto e roda só o classificador de emoção
+        detections = obter_detector().detect_emotions(recorte, face_rectangles=[(x - x0, y - y0, w, h)])
+        if not detections:
+            return None
+        return _emocao_principal(detections[0])
+
+# --- Filtro de movimento / presença de rosto ---
+class FiltroMovimento:
+    INFERIR = 'inferir'
+    SEM_MUDANCA = 'sem_mudanca'
+    SEM_ROSTO = 'sem_rosto'
+
+    def __init__(self, usar_haar=USE_HAAR_GATE, limiar_pixel=GATE_PIXEL_THRESHOLD,
+                 fracao_mudanca=GATE_CHANGED_FRACTION, max_pulo=GATE_MAX_SKIP_SECONDS):
+        self.limiar_pixel = limiar_pixel
+        self.fracao_mudanca = fracao_mudanca
+        self.max_pulo = max_pulo
+        self._referencia = None
+        self._ultima_inferencia = 0.0
+        self._haar = None
+        if usar_haar and hasattr(cv2, 'data'):
+            self._haar = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            if self._haar.empty():
+                print("[ERRO] Cascade Haar não encontrado; filtro de rosto desativado.")
+                self._haar = None
+
+    @staticmethod
+    def _miniatura(frame):
+        cinza = cv2.cvtColor(cv2.resize(frame, (64, 48), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(cinza, (5, 5), 0)
+
+    def avaliar(self, frame, agora):
+        miniatura = self._miniatura(frame)
+        # Mesmo com a cena parada, roda a inferência de tempos em tempos
+        if self._referencia is None or agora - self._ultima_inferencia >= self.max_pulo:
+            return self.INFERIR, miniatura
+
+        diferenca = cv2.absdiff(miniatura, self._referencia)
+        mudou = (diferenca > self.limiar_pixel).mean() >= self.fracao_mudanca
+        if not mudou:
+            return self.SEM_MUDANCA, miniatura
+
+        if self._haar is not None:
+            # Mesma resolução da inferência: um rosto que o detector acharia não escapa do Haar
+            cinza = cv2.cvtColor(cv2.resize(frame, (0, 0), fx=PROCESS_SCALE, fy=PROCESS_SCALE), cv2.COLOR_BGR2GRAY)
+            rostos = self._haar.detectMultiScale(cinza, scaleFactor=1.2, minNeighbors=3,
+                                                 minSize=(GATE_MIN_FACE, GATE_MIN_FACE))
+            if len(rostos) == 0:
+                # A cena mudou e ficou sem rosto; a nova cena vira a referência
+                self._referencia = miniatura
+                return self.SEM_ROSTO, miniatura
+        return self.INFERIR, miniatura
+
+    def registrar_inferencia(self, miniatura, agora):
+        self._referencia = miniatura
+        self._ultima_inferencia = agora
+
+def _incrementar(contadores, nome):
+    if contadores is not None:
+        contadores[CONTADORES.index(nome)] += 1
+
+# --- Máquina de estados de persistência ---
+# Uma emoção só é confirmada depois de aparecer em PERSISTENCE_COUNT detecções seguidas.
+class MaquinaPersistencia:
+    def __init__(self, persistence_count=PERSISTENCE_COUNT, inicio_tempo=None):
+        self.persistence_count = persistence_count
+        self.humor_anterior = None
+        self.pending_humor = None
+        self.consecutive_count = 0
+        self.inicio_tempo = time.time() if inicio_tempo is None else inicio_tempo
+        self.pendente_desde = None
+        # Segundos entre a primeira detecção do humor confirmado por último e a confirmação
+        self.espera_confirmacao = None
+
+    # Retorna (humor_atual, humor_anterior, duracao) quando uma mudança é confirmada, senão None.
+    # Na primeira confirmação humor_anterior é None.
+    def registrar(self, humor_atual, current_time):
+        if humor_atual == self.humor_anterior:
+            self.pending_humor = None
+            self.consecutive_count = 0
+            return None
+        if humor_atual != self.pending_humor:
+            self.pending_humor = humor_atual
+            self.pendente_desde = current_time
+            self.consecutive_count = 1
+            return None
+
+        self.consecutive_count += 1
+        if self.consecutive_count < self.persistence_count:
+            return None
+
+        confirmacao = (humor_atual, self.humor_anterior, round(current_time - self.inicio_tempo, 2))
+        self.espera_confirmacao = current_time - self.pendente_desde
+        self.humor_anterior = humor_atual
+        self.inicio_tempo = current_time
+        self.pending_humor = None
+        self.consecutive_count = 0
+        return confirmacao
+
+# --- Agendador adaptativo das detecções ---
+class AgendadorDeteccao:
+    def __init__(self, intervalo_base=DETECTION_INTERVAL, intervalo_pendente=PENDING_DETECTION_INTERVAL,
+                 intervalo_max=MAX_STABLE_DETECTION_INTERVAL, backoff=STABLE_BACKOFF, fator_global=None):
+        self.intervalo_base = intervalo_base
+        self.intervalo_pendente = intervalo_pendente
+        self.intervalo_max = intervalo_max
+        self.backoff = backoff
+        self.intervalo = intervalo_base
+        self._fator_global = fator_global
+
+    def atualizar(self, maquina, humor_atual):
+        if maquina.pending_humor is not None:
+            self.intervalo = self.intervalo_pendente
+        elif humor_atual is not None and humor_atual == maquina.humor_anterior:
+            self.intervalo = min(self.intervalo_max, max(self.intervalo, self.intervalo_base) * self.backoff)
+        else:
+            self.intervalo = self.intervalo_base
+
+    def proximo_intervalo(self):
+        fator = self._fator_global.value if self._fator_global is not None else 1.0
+        return self.intervalo * fator
+
+# --- Captura de frames em thread dedicada ---
+# Lê a câmera continuamente e guarda só o frame mais recente (buffer de uma posição),
+# então a inferência nunca deixa o buffer RTSP acumular. A reconexão acontece aqui,
+# fora do caminho da inferência, com backoff exponencial limitado.
+class CapturaFrames:
+    def __init__(self, camera_url, backoff_inicial=0.5, backoff_max=30.0, max_falhas=5):
+        self.camera_url = camera_url
+        self.conectado = False
+        self.frames_lidos = 0
+        self.reconexoes = 0
+        self._backoff_inicial = backoff_inicial
+        self._backoff_max = backoff_max
+        self._max_falhas = max_falhas
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._timestamp = 0.0
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop, name="captura-frames", daemon=True)
+        self._thread.start()
+
+    def parar(self, timeout=5.0):
+        self._parar.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _abrir(self):
+        cap = cv2.VideoCapture(self.camera_url)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if cap.isOpened():
+            return cap
+        cap.release()
+        return None
+
+    def _loop(self):
+        cap = None
+        backoff = self._backoff_inicial
+        falhas = 0
+        while not self._parar.is_set():
+            if cap is None:
+                cap = self._abrir()
+                if cap is None:
+                    print(f"[ERRO] Câmera {self.camera_url} indisponível. Nova tentativa em {backoff:.1f}s.")
+                    self._parar.wait(backoff)
+                    backoff = min(backoff * 2, self._backoff_max)
+                    continue
+                print(f"[INFO] Câmera {self.camera_url} conectada.")
+                self.conectado = True
+                backoff = self._backoff_inicial
+                falhas = 0
+
+            inicio = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                falhas += 1
+                if falhas >= self._max_falhas:
+                    print("[ERRO] Falha na leitura do frame. Tentando reabrir o cap.")
+                    cap.release()
+                    cap = None
+                    self.conectado = False
+                    self.reconexoes += 1
+                    if _metricas is not None:
+                        _metricas.incrementar('reconexoes')
+                else:
+                    self._parar.wait(0.05)
+                continue
+
+            _observar('frame_leitura', inicio)
+            falhas = 0
+            self.frames_lidos += 1
+            with self._cond:
+                self._frame = frame
+                self._seq += 1
+                self._timestamp = time.time()
+                self._cond.notify_all()
+
+        if cap is not None:
+            cap.release()
+        self.conectado = False
+
+    # Espera um frame mais novo que apos_seq e retorna (seq, frame, timestamp), ou None no timeout.
+    def ultimo_frame(self, apos_seq=0, timeout=1.0):
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > apos_seq or self._parar.is_set(), timeout)
+            if self._seq <= apos_seq:
+                return None
+            return self._seq, self._frame, self._timestamp
+
+# --- Processo de captura ---
+# Lê a câmera (CapturaFrames), copia cada frame novo para o anel compartilhado com a inferência
+# e, enquanto alguém assiste, codifica os JPEGs direto no canal de vídeo lido pela API.
+def loop_captura(user_id, camera_url, nome_anel, nome_video, contadores=None, parar=None, metricas=None):
+    global _metricas
+    _metricas = MetricasDeteccao(metricas) if metricas is not None else None
+    captura = CapturaFrames(camera_url)
+    captura.iniciar()
+    anel = AnelFrames(nome_anel)
+    video = CanalVideo(nome_video)
+    seq = 0
+    print(f"[INFO] Captura iniciada (user {user_id}, câmera {camera_url}).")
+
+    while parar is None or not parar.is_set():
+        item = captura.ultimo_frame(seq, timeout=1.0)
+        if item is None:
+            continue
+        seq, frame, timestamp = item
+        if frame.nbytes > anel.max_bytes:
+            escala = (anel.max_bytes / frame.nbytes) ** 0.5
+            frame = cv2.resize(frame, (0, 0), fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+        anel.escrever(frame, timestamp)
+        _incrementar(contadores, 'frames_capturados')
+        publicar_frame(frame, video, _metricas)
+
+    captura.parar()
+    anel.fechar()
+    video.fechar()
+    print(f"[INFO] Captura do user {user_id} encerrada.")
+
+# --- Pipeline de um frame: rastreamento -> filtro -> inferência -> persistência ---
+# Usado pelo loop ao vivo e pelo benchmark (benchmark.py), que passa `tempos` para medir
+# cada etapa. processar() retorna o evento confirmado (dict) ou None.
+class PipelineDeteccao:
+    ETAPAS = ('rastreamento', 'filtro', 'inferencia', 'persistencia')
+
+    def __init__(self, user_id, contadores=None, fator_global=None, inicio_tempo=None, tempos=None, verbose=True):
+        self.user_id = user_id
+        self.contadores = contadores
+        self.tempos = tempos  # {etapa: [segundos, ...]} ou None
+        self.verbose = verbose
+        inicio_tempo = time.time() if inicio_tempo is None else inicio_tempo
+        self.maquina = MaquinaPersistencia(inicio_tempo=inicio_tempo)
+        self.rastreador = RastreadorFace() if USE_TRACKING else None
+        self.filtro = FiltroMovimento() if USE_MOTION_GATE else None
+        self.agendador = AgendadorDeteccao(fator_global=fator_global)
+        self.ultimo_humor = None
+        self.last_detection_time = inicio_tempo
+
+    def _medir(self, etapa, inicio):
+        if self.tempos is not None:
+            self.tempos.setdefault(etapa, []).append(time.perf_counter() - inicio)
+
+    def processar(self, frame, current_time):
+        contadores = self.contadores
+        maquina = self.maquina
+        _incrementar(contadores, 'frames_consumidos')
+        if self.rastreador is not None:
+            inicio = time.perf_counter()
+            self.rastreador.acompanhar(frame)
+            self._medir('rastreamento', inicio)
+
+        if current_time - self.last_detection_time < self.agendador.proximo_intervalo():
+            return None
+
+        evento = None
+        decisao, miniatura = FiltroMovimento.INFERIR, None
+        # Com uma emoção aguardando confirmação o filtro não pula nada: só inferências reais
+        # confirmam ou derrubam a emoção pendente
+        if self.filtro and maquina.pending_humor is None:
+            inicio = time.perf_counter()
+            decisao, miniatura = self.filtro.avaliar(frame, current_time)
+            self._medir('filtro', inicio)
+        elif self.filtro:
+            miniatura = self.filtro._miniatura(frame)
+        if decisao == FiltroMovimento.SEM_MUDANCA:
+            # Cena parada: a emoção é a mesma da última inferência (mas não conta para a persistência)
+            _incrementar(contadores, 'pulados_sem_mudanca')
+            humor_atual = self.ultimo_humor
+        elif decisao == FiltroMovimento.SEM_ROSTO:
+            _incrementar(contadores, 'pulados_sem_rosto')
+            humor_atual = self.ultimo_humor = None
+        else:
+            _incrementar(contadores, 'inferencias')
+            inicio_inferencia = time.perf_counter()
+            humor_atual = self.ultimo_humor = detectar_emocao(frame, self.rastreador, current_time)
+            self._medir('inferencia', inicio_inferencia)
+            if contadores is not None:
+                contadores[CONTADORES.index('inferencia_ms')] += int((time.perf_counter() - inicio_inferencia) * 1000)
+            if self.filtro:
+                self.filtro.registrar_inferencia(miniatura, current_time)
+        if humor_atual is not None and decisao == FiltroMovimento.INFERIR:
+            if self.verbose:
+                print(f"[DEBUG] user {self.user_id} | Emoção detectada: {humor_atual} | Última Confirmada: {maquina.humor_anterior} | Pendente: {maquina.pending_humor} ({maquina.consecutive_count}/{maquina.persistence_count}) | Latência: {time.time() - current_time:.2f}s")
+            inicio = time.perf_counter()
+            confirmacao = maquina.registrar(humor_atual, current_time)
+            self._medir('persistencia', inicio)
+            if confirmacao is not None:
+                humor_atual, humor_anterior, duracao = confirmacao
+                if humor_anterior is not None:
+                    evento = {
+                        'user_id': self.user_id,
+                        'humor_atual': humor_atual,
+                        'humor_anterior': humor_anterior,
+                        'duracao': duracao,
+                        'timestamp': current_time,
+                    }
+                if _metricas is not None:
+                    _metricas.observar('confirmacao', maquina.espera_confirmacao)
+                if self.verbose:
+                    print(f"[CONFIRMADO] user {self.user_id}: alteração para {humor_atual} após {maquina.persistence_count} detecções seguidas.")
+        self.agendador.atualizar(maquina, humor_atual)
+        self.last_detection_time = current_time
+        return evento
+
+# --- Loop de detecção contínua (processo de inferência) ---
+# Consome sempre o frame mais recente do anel; frames que chegam durante a inferência
+# são simplesmente sobrescritos, o que limita a latência câmera -> emoção (e contam como
+# frames_descartados nas métricas).
+def loop_deteccao_continua(user_id, nome_anel, fila_eventos, contadores=None, fator_global=None, parar=None, metricas=None):
+    global _metricas
+    if metricas is not None:
+        _metricas = MetricasDeteccao(metricas)
+        if PERFIL_HABILITADO:
+            AmostradorPerfil(_metricas, PASTA_PERFIS, f'perfil_user{user_id}').iniciar()
+    anel = AnelFrames(nome_anel)
+    aquecimento_ms = aquecer_detector()
+    print(f"[INFO] Detector do user {user_id} aquecido em {aquecimento_ms} ms.")
+    if contadores is not None:
+        contadores[CONTADORES.index('aquecimento_ms')] = aquecimento_ms
+        contadores[CONTADORES.index('pronto')] = 1
+    pipeline = PipelineDeteccao(user_id, contadores, fator_global)
+    seq = 0
+    print(f"[INFO] Loop de detecção contínua iniciado (user {user_id}).")
+
+    while parar is None or not parar.is_set():
+        item = anel.ler(seq, timeout=1.0)
+        if item is None:
+            continue
+        if _metricas is not None and seq and item[0] > seq + 1:
+            _metricas.incrementar('frames_descartados', item[0] - seq - 1)
+        seq, frame, current_time = item
+        evento = pipeline.processar(frame, current_time)
+        if evento is not None:
+            fila_eventos.put(evento)
+
+    anel.liberar()
+    anel.fechar()
+    print(f"[INFO] Loop de detecção do user {user_id} encerrado.")
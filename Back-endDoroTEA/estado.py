@@ -0,0 +1,64 @@
+import hashlib
+import json
+import threading
+
+# Versão derivada do conteúdo: workers WSGI diferentes com o mesmo estado chegam ao mesmo
+# número (e ao mesmo ETag), e um reinício só repete a versão se o conteúdo for o mesmo.
+# 48 bits cabem num inteiro de JSON/JavaScript sem perder precisão.
+def versao_conteudo(dados):
+    resumo = hashlib.blake2b(json.dumps(dados, sort_keys=True, default=str).encode('utf-8'), digest_size=6).digest()
+    return int.from_bytes(resumo, 'big')
+
+# --- Estado atual por usuário (humor + música selecionada) em memória ---
+# Atualizado quando uma emoção é confirmada e quando /select_music grava a seleção.
+# Cada mudança troca a versão do usuário (ver versao_conteudo) e acorda quem está esperando (SSE / long-poll).
+class EstadoUsuarios:
+    def __init__(self, carregar):
+        # carregar(user_id) -> dict com os campos iniciais, lido do banco na primeira consulta
+        self._carregar = carregar
+        self._cond = threading.Condition()
+        self._estados = {}
+
+    def _garantir(self, user_id):
+        estado = self._estados.get(user_id)
+        if estado is None:
+            campos = self._carregar(user_id)
+            with self._cond:
+                estado = self._estados.get(user_id)
+                if estado is None:
+                    estado = dict(campos, versao=versao_conteudo(campos))
+                    self._estados[user_id] = estado
+        return estado
+
+    def obter(self, user_id):
+        self._garantir(user_id)
+        with self._cond:
+            return dict(self._estados[user_id])
+
+    def atualizar(self, user_id, **campos):
+        self._garantir(user_id)
+        with self._cond:
+            estado = dict(self._estados[user_id], **campos)
+            estado.pop('versao')
+            self._estados[user_id] = dict(estado, versao=versao_conteudo(estado))
+            self._cond.notify_all()
+
+    def invalidar(self, user_id):
+        with self._cond:
+            self._estados.pop(user_id, None)
+            self._cond.notify_all()
+
+    # Espera até a versão do usuário ser diferente de `versao`; retorna o estado (ou None no timeout)
+    def aguardar(self, user_id, versao, timeout):
+        self._garantir(user_id)
+        with self._cond:
+            def mudou():
+                estado = self._estados.get(user_id)
+                return estado is not None and estado['versao'] != versao
+            if not self._cond.wait_for(mudou, timeout):
+                return None
+            return dict(self._estados[user_id])
+
+    @staticmethod
+    def etag(user_id, estado):
+        return f"{user_id}-{estado['versao']}"
@@ -0,0 +1,87 @@
+import queue
+import threading
+import time
+
+# --- Fila de escrita em segundo plano (write-behind) ---
+# Quem produz só enfileira; uma única thread escritora agrupa os itens e chama
+# gravar_lote(itens) uma vez por lote, quando o lote enche ou quando o intervalo vence.
+class FilaEscrita:
+    def __init__(self, gravar_lote, nome='fila-escrita', tamanho_max=10000, tamanho_lote=100,
+                 intervalo_flush=1.0, tentativas=3, timeout_enfileirar=0.5):
+        self._gravar_lote = gravar_lote
+        self._nome = nome
+        self._fila = queue.Queue(maxsize=tamanho_max)
+        self._tamanho_lote = tamanho_lote
+        self._intervalo_flush = intervalo_flush
+        self._tentativas = tentativas
+        self._timeout_enfileirar = timeout_enfileirar
+        self._encerrar = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.gravados = 0
+        self.descartados = 0
+        self.lotes = 0
+
+    def iniciar(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._encerrar.clear()
+            self._thread = threading.Thread(target=self._loop, name=self._nome, daemon=True)
+            self._thread.start()
+
+    def enfileirar(self, item):
+        self.iniciar()
+        try:
+            self._fila.put(item, timeout=self._timeout_enfileirar)
+            return True
+        except queue.Full:
+            # Fila cheia: o banco está travado há muito tempo; descarta para não travar quem produz
+            self.descartados += 1
+            print(f"[ERRO] {self._nome}: fila cheia, item descartado ({self.descartados} no total).")
+            return False
+
+    def _loop(self):
+        while not (self._encerrar.is_set() and self._fila.empty()):
+            lote = []
+            limite = time.time() + self._intervalo_flush
+            while len(lote) < self._tamanho_lote:
+                try:
+                    if self._encerrar.is_set():
+                        # No encerramento drena o que já está na fila em lotes cheios, sem esperar o intervalo
+                        lote.append(self._fila.get_nowait())
+                        continue
+                    restante = limite - time.time()
+                    if restante <= 0:
+                        break
+                    lote.append(self._fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+            if lote:
+                self._gravar(lote)
+
+    def _gravar(self, lote):
+        for tentativa in range(1, self._tentativas + 1):
+            try:
+                self._gravar_lote(lote)
+                self.gravados += len(lote)
+                self.lotes += 1
+                return
+            except Exception as e:
+                print(f"[ERRO] {self._nome}: falha ao gravar lote de {len(lote)} (tentativa {tentativa}): {str(e)}")
+                time.sleep(0.2 * tentativa)
+        self.descartados += len(lote)
+
+    # Drena a fila e espera a thread terminar (chamado no desligamento)
+    def encerrar(self, timeout=10.0):
+        self._encerrar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self):
+        return {
+            'pendentes': self._fila.qsize(),
+            'gravados': self.gravados,
+            'lotes': self.lotes,
+            'descartados': self.descartados,
+        }
@@ -0,0 +1,119 @@
+import os
+
+import cv2
+import numpy as np
+
+# --- Backends de inferência de emoção ---
+# Todos seguem o contrato do FER: detect_emotions(imagem_bgr, face_rectangles=None) retorna
+# [{'box': (x, y, w, h), 'emotions': {emoção: probabilidade}}, ...]. Com face_rectangles o
+# backend pula a detecção de rosto e só classifica as caixas dadas (ver RastreadorFace).
+#
+# DETECCAO_BACKEND=fer  (padrão) FER + MTCNN/TensorFlow
+# DETECCAO_BACKEND=onnx YuNet (cv2.FaceDetectorYN) + classificador FER+ no ONNX Runtime;
+#                       sem TensorFlow, bem mais leve em CPU e memória.
+BACKEND_PADRAO = os.environ.get('DETECCAO_BACKEND', 'fer')
+PASTA_MODELOS = os.environ.get('DETECCAO_MODELOS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'modelos'))
+# Modelos do OpenCV Zoo / ONNX Model Zoo (baixados para PASTA_MODELOS)
+MODELO_ROSTO = 'face_detection_yunet_2023mar.onnx'
+MODELO_EMOCAO = 'emotion-ferplus-8.onnx'
+# DETECCAO_INT8=1 usa a versão quantizada do classificador (gerada na primeira vez, se faltar)
+USAR_INT8 = os.environ.get('DETECCAO_INT8') == '1'
+# Threads do ONNX Runtime por processo de inferência; 1 rende mais com várias câmeras na mesma máquina
+THREADS_ONNX = int(os.environ.get('DETECCAO_THREADS', 1))
+LIMIAR_ROSTO = 0.8
+
+# Saídas do FER+ na ordem do modelo, já com os nomes usados pelo FER (desprezo conta como nojo)
+EMOCOES_FERPLUS = ['neutral', 'happy', 'surprise', 'sad', 'angry', 'disgust', 'fear', 'disgust']
+
+class BackendFER:
+    nome = 'fer'
+
+    def __init__(self, mtcnn=True):
+        from fer.fer import FER
+        self._fer = FER(mtcnn=mtcnn)
+
+    def detect_emotions(self, imagem, face_rectangles=None):
+        return self._fer.detect_emotions(imagem, face_rectangles=face_rectangles)
+
+def quantizar_int8(entrada, saida):
+    # Quantização dinâmica: pesos em INT8, ativações quantizadas em tempo de execução
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(entrada, saida, weight_type=QuantType.QInt8)
+    return saida
+
+class BackendONNX:
+    nome = 'onnx'
+
+    def __init__(self, pasta=PASTA_MODELOS, int8=USAR_INT8, threads=THREADS_ONNX, limiar_rosto=LIMIAR_ROSTO):
+        import onnxruntime as ort
+        caminho_emocao = os.path.join(pasta, MODELO_EMOCAO)
+        if int8:
+            caminho_int8 = os.path.splitext(caminho_emocao)[0] + '.int8.onnx'
+            if not os.path.exists(caminho_int8):
+                print(f"[INFO] Gerando {caminho_int8} (quantização INT8).")
+                quantizar_int8(caminho_emocao, caminho_int8)
+            caminho_emocao = caminho_int8
+        opcoes = ort.SessionOptions()
+        opcoes.intra_op_num_threads = threads
+        opcoes.inter_op_num_threads = 1
+        opcoes.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._sessao = ort.InferenceSession(caminho_emocao, opcoes, providers=['CPUExecutionProvider'])
+        entrada = self._sessao.get_inputs()[0]
+        self._entrada = entrada.name
+        self._lado = entrada.shape[-1] if isinstance(entrada.shape[-1], int) else 64
+
+        caminho_rosto = os.path.join(pasta, MODELO_ROSTO)
+        if not os.path.exists(caminho_rosto):
+            raise FileNotFoundError(caminho_rosto)
+        self._rosto = cv2.FaceDetectorYN.create(caminho_rosto, '', (320, 320), limiar_rosto)
+        self._tamanho_rosto = None
+
+    def _detectar_rostos(self, imagem):
+        altura, largura = imagem.shape[:2]
+        if self._tamanho_rosto != (largura, altura):
+            self._rosto.setInputSize((largura, altura))
+            self._tamanho_rosto = (largura, altura)
+        _, rostos = self._rosto.detect(imagem)
+        if rostos is None:
+            return []
+        # Colunas: x, y, w, h, 5 pontos (x, y) e a confiança; o mais confiável primeiro
+        rostos = sorted(rostos, key=lambda r: r[-1], reverse=True)
+        return [tuple(int(v) for v in r[:4]) for r in rostos]
+
+    def _classificar(self, cinza, caixa):
+        x, y, w, h = caixa
+        altura, largura = cinza.shape[:2]
+        x0, y0, x1, y1 = max(0, x), max(0, y), min(largura, x + w), min(altura, y + h)
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return None
+        rosto = cv2.resize(cinza[y0:y1, x0:x1], (self._lado, self._lado), interpolation=cv2.INTER_AREA)
+        entrada = rosto.astype(np.float32).reshape(1, 1, self._lado, self._lado)
+        saida = self._sessao.run(None, {self._entrada: entrada})[0].reshape(-1)
+        probabilidades = np.exp(saida - saida.max())
+        probabilidades /= probabilidades.sum()
+        emocoes = {}
+        for emocao, p in zip(EMOCOES_FERPLUS, probabilidades):
+            emocoes[emocao] = round(emocoes.get(emocao, 0.0) + float(p), 2)
+        return emocoes
+
+    def detect_emotions(self, imagem, face_rectangles=None):
+        caixas = face_rectangles if face_rectangles is not None else self._detectar_rostos(imagem)
+        if not caixas:
+            return []
+        cinza = cv2.cvtColor(imagem, cv2.COLOR_BGR2GRAY)
+        resultado = []
+        for caixa in caixas:
+            emocoes = self._classificar(cinza, caixa)
+            if emocoes is not None:
+                resultado.append({'box': tuple(caixa), 'emotions': emocoes})
+        return resultado
+
+BACKENDS = {
+    'fer': BackendFER,
+    'onnx': BackendONNX,
+}
+
+def criar_backend(nome=BACKEND_PADRAO, **opcoes):
+    if nome not in BACKENDS:
+        raise ValueError(f"Backend de inferência desconhecido: {nome}. Use: {', '.join(BACKENDS)}.")
+    return BACKENDS[nome](**opcoes)
@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+# Prefixo dos segmentos em /dev/shm; mude para rodar duas instâncias na mesma máquina
+PREFIXO = os.environ.get('DETECCAO_PREFIXO', 'dorotea')
+
+def nome_segmento(tipo, user_id=None):
+    return f'{PREFIXO}_{tipo}' if user_id is None else f'{PREFIXO}_{tipo}_{user_id}'
+
+def criar_segmento(nome, tamanho):
+    try:
+        return shared_memory.SharedMemory(name=nome, create=True, size=tamanho)
+    except FileExistsError:
+        # Sobra de uma execução que caiu sem limpar: descarta e cria de novo
+        antigo = shared_memory.SharedMemory(name=nome)
+        antigo.close()
+        antigo.unlink()
+        return shared_memory.SharedMemory(name=nome, create=True, size=tamanho)
+
+# rastrear=False para processos que não descendem do dono (ex.: workers do servidor WSGI):
+# sem isso o resource_tracker deles apagaria o segmento quando o processo terminasse.
+def anexar_segmento(nome, rastrear=True):
+    shm = shared_memory.SharedMemory(name=nome)
+    if not rastrear:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+# --- Anel de frames entre o processo de captura e o de inferência ---
+# `slots` posições de tamanho fixo. Um escritor (captura) e um leitor (inferência): o leitor
+# marca a posição que está usando e o escritor nunca sobrescreve essa nem a mais recente,
+# então a inferência trabalha direto sobre a memória compartilhada, sem cópia nem pickle.
+# Cabeçalho (float64): slots, max_bytes, último seq, slot do último, slot do leitor;
+# depois, por slot: seq, timestamp, altura, largura.
+_CABECALHO_ANEL = 5
+
+class AnelFrames:
+    def __init__(self, nome, slots=4, max_bytes=1920 * 1080 * 3, criar=False):
+        import numpy as np  # sob demanda: a API importa este módulo sem precisar do numpy
+        self.nome = nome
+        self._dono = criar
+        if criar:
+            self._shm = criar_segmento(nome, 8 * (_CABECALHO_ANEL + 4 * slots) + slots * max_bytes)
+            np.ndarray((2,), dtype=np.float64, buffer=self._shm.buf)[:] = (slots, max_bytes)
+        else:
+            self._shm = anexar_segmento(nome)
+        slots, max_bytes = (int(v) for v in np.ndarray((2,), dtype=np.float64, buffer=self._shm.buf))
+        self.slots = slots
+        self.max_bytes = max_bytes
+        self._cab = np.ndarray((_CABECALHO_ANEL,), dtype=np.float64, buffer=self._shm.buf)
+        self._info = np.ndarray((slots, 4), dtype=np.float64, buffer=self._shm.buf, offset=8 * _CABECALHO_ANEL)
+        inicio = 8 * (_CABECALHO_ANEL + 4 * slots)
+        self._dados = [np.ndarray((max_bytes,), dtype=np.uint8, buffer=self._shm.buf, offset=inicio + i * max_bytes)
+                       for i in range(slots)]
+        if criar:
+            self._cab[2:] = (0, -1, -1)
+
+    # --- Lado da captura ---
+    def escrever(self, frame, timestamp):
+        if frame.nbytes > self.max_bytes:
+            raise ValueError(f'Frame de {frame.nbytes} bytes não cabe no anel ({self.max_bytes}).')
+        seq = int(self._cab[2]) + 1
+        ultimo = int(self._cab[3])
+        for passo in range(1, self.slots + 1):
+            slot = (ultimo + passo) % self.slots
+            if slot == ultimo or slot == int(self._cab[4]):
+                continue
+            self._info[slot, 0] = 0  # invalida antes de escrever
+            if slot == int(self._cab[4]):
+                continue  # o leitor pegou esta posição no meio do caminho
+            altura, largura = frame.shape[:2]
+            self._dados[slot][:frame.nbytes].reshape(frame.shape)[:] = frame
+            self._info[slot, 1:] = (timestamp, altura, largura)
+            self._info[slot, 0] = seq
+            self._cab[3] = slot
+            self._cab[2] = seq
+            return seq
+        return None
+
+    # --- Lado da inferência ---
+    # Espera um frame mais novo que apos_seq e retorna (seq, frame, timestamp), ou None no timeout.
+    # O frame aponta para a memória compartilhada e vale até a próxima chamada de ler().
+    def ler(self, apos_seq=0, timeout=1.0, espera=0.005):
+        limite = time.time() + timeout
+        while True:
+            seq = int(self._cab[2])
+            if seq > apos_seq:
+                slot = int(self._cab[3])
+                self._cab[4] = slot
+                if int(self._info[slot, 0]) == seq:
+                    timestamp, altura, largura = self._info[slot, 1:]
+                    altura, largura = int(altura), int(largura)
+                    frame = self._dados[slot][:altura * largura * 3].reshape(altura, largura, 3)
+                    return seq, frame, timestamp
+                continue  # o escritor avançou entre as leituras do cabeçalho; tenta de novo
+            if time.time() >= limite:
+                return None
+            time.sleep(espera)
+
+    def liberar(self):
+        self._cab[4] = -1
+
+    def fechar(self):
+        del self._cab, self._info, self._dados
+        self._shm.close()
+        if self._dono:
+            self._shm.unlink()
+
+# --- Mural de eventos entre processos ---
+# Anel de registros (seq, user_id, pid, tamanho, JSON) em um segmento com nome fixo. O serviço
+# de detecção publica as emoções confirmadas e cada worker da API acompanha o mural numa thread,
+# aplicando os campos no seu cache de estado. Vários escritores se revezam com um flock.
+class MuralEventos:
+    REGISTRO = 256
+    _CAMPOS = 4
+
+    def __init__(self, nome, registros=1024):
+        import numpy as np
+        self.nome = nome
+        self.registros = registros
+        tamanho = 8 + registros * self.REGISTRO
+        try:
+            self._shm = shared_memory.SharedMemory(name=nome, create=True, size=tamanho)
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(name=nome)
+        # O mural não tem dono: fica em /dev/shm enquanto a máquina estiver ligada
+        resource_tracker.unregister(self._shm._name, 'shared_memory')
+        self._ultimo = np.ndarray((1,), dtype=np.int64, buffer=self._shm.buf)
+        self._campos = np.ndarray((registros, self.REGISTRO // 8), dtype=np.int64, buffer=self._shm.buf, offset=8)
+        self._bytes = np.ndarray((registros, self.REGISTRO), dtype=np.uint8, buffer=self._shm.buf, offset=8)
+        self._caminho_lock = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else '/tmp', nome + '.lock')
+        self._thread = None
+
+    def publicar(self, user_id, **campos):
+        import fcntl
+        import numpy as np
+        dados = json.dumps(campos, ensure_ascii=False).encode('utf-8')
+        maximo = self.REGISTRO - 8 * self._CAMPOS
+        if len(dados) > maximo:
+            raise ValueError(f'Registro do mural maior que {maximo} bytes.')
+        with open(self._caminho_lock, 'a') as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            seq = int(self._ultimo[0]) + 1
+            i = seq % self.registros
+            self._campos[i, 0] = -1
+            self._bytes[i, 8 * self._CAMPOS:8 * self._CAMPOS + len(dados)] = np.frombuffer(dados, dtype=np.uint8)
+            self._campos[i, 1:self._CAMPOS] = (user_id, os.getpid(), len(dados))
+            self._campos[i, 0] = seq
+            self._ultimo[0] = seq
+        return seq
+
+    # Registros novos depois de apos_seq: lista de (seq, user_id, campos). Os do próprio processo são pulados.
+    def ler(self, apos_seq):
+        ultimo = int(self._ultimo[0])
+        novos = []
+        for seq in range(max(apos_seq + 1, ultimo - self.registros + 1), ultimo + 1):
+            i = seq % self.registros
+            user_id, pid, tamanho = (int(v) for v in self._campos[i, 1:self._CAMPOS])
+            dados = self._bytes[i, 8 * self._CAMPOS:8 * self._CAMPOS + tamanho].tobytes()
+            if int(self._campos[i, 0]) != seq:
+                continue  # sobrescrito enquanto líamos
+            if pid != os.getpid():
+                novos.append((seq, user_id, json.loads(dados)))
+        return ultimo, novos
+
+    # Acompanha o mural numa thread e chama aplicar(user_id, campos) para cada registro novo
+    def acompanhar(self, aplicar, intervalo=0.1):
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def loop():
+            visto = int(self._ultimo[0])
+            while True:
+                time.sleep(intervalo)
+                try:
+                    visto, novos = self.ler(visto)
+                    for _, user_id, campos in novos:
+                        aplicar(user_id, campos)
+                except Exception as e:
+                    print(f"[ERRO] Mural de eventos: {str(e)}")
+
+        self._thread = threading.Thread(target=loop, name="mural-eventos", daemon=True)
+        self._thread.start()
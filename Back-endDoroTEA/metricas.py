@@ -0,0 +1,290 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# --- Métricas no formato texto do Prometheus (sem dependências) ---
+# Histograma, Contador e Medidor guardam séries por combinação de rótulos; Registro junta tudo
+# e gera o texto servido em /metrics.
+BALDES_PADRAO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BALDES_CONFIRMACAO = (0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+PREFIXO = 'dorotea_'
+TIPO_CONTEUDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _rotulos(pares):
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in pares) + '}'
+
+def _numero(valor):
+    valor = float(valor)
+    if valor == float('inf'):
+        return '+Inf'
+    return str(int(valor)) if valor.is_integer() else repr(valor)
+
+# Série de histograma: [acumulado por balde..., soma, contagem]
+def _nova_serie(baldes):
+    return [0.0] * (len(baldes) + 2)
+
+def _somar(serie, baldes, valor):
+    for i, limite in enumerate(baldes):
+        if valor <= limite:
+            serie[i] += 1
+    serie[-2] += valor
+    serie[-1] += 1
+
+def linhas_histograma(nome, ajuda, baldes, series):
+    # series: [(pares de rótulos, serie), ...]
+    linhas = [f'# HELP {nome} {ajuda}', f'# TYPE {nome} histogram']
+    for pares, serie in series:
+        for limite, acumulado in zip(baldes, serie):
+            linhas.append(f'{nome}_bucket{_rotulos(list(pares) + [("le", _numero(limite))])} {_numero(acumulado)}')
+        linhas.append(f'{nome}_bucket{_rotulos(list(pares) + [("le", "+Inf")])} {_numero(serie[-1])}')
+        linhas.append(f'{nome}_sum{_rotulos(pares)} {_numero(serie[-2])}')
+        linhas.append(f'{nome}_count{_rotulos(pares)} {_numero(serie[-1])}')
+    return linhas
+
+def linhas_simples(nome, ajuda, tipo, valores):
+    # valores: [(pares de rótulos, valor), ...]
+    return [f'# HELP {nome} {ajuda}', f'# TYPE {nome} {tipo}'] + [
+        f'{nome}{_rotulos(pares)} {_numero(valor)}' for pares, valor in valores
+    ]
+
+class Histograma:
+    def __init__(self, nome, ajuda, rotulos=(), baldes=BALDES_PADRAO):
+        self.nome = PREFIXO + nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.baldes = tuple(baldes)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observar(self, valor, *rotulos):
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = self._series[rotulos] = _nova_serie(self.baldes)
+            _somar(serie, self.baldes, valor)
+
+    def linhas(self):
+        with self._lock:
+            series = [(tuple(zip(self.rotulos, r)), list(s)) for r, s in self._series.items()]
+        return linhas_histograma(self.nome, self.ajuda, self.baldes, series)
+
+class Contador:
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = PREFIXO + nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+        self._valores = Counter()
+
+    def incrementar(self, *rotulos, valor=1):
+        with self._lock:
+            self._valores[rotulos] += valor
+
+    def linhas(self):
+        with self._lock:
+            valores = [(tuple(zip(self.rotulos, r)), v) for r, v in self._valores.items()]
+        return linhas_simples(self.nome, self.ajuda, 'counter', valores)
+
+# Valor lido na hora da coleta: ler() -> número ou [(rótulos, valor), ...]. tipo='counter' para
+# totais que já são mantidos em outro lugar (ex.: FilaEscrita.gravados).
+class Medidor:
+    def __init__(self, nome, ajuda, ler, rotulos=(), tipo='gauge'):
+        self.nome = PREFIXO + nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.tipo = tipo
+        self._ler = ler
+
+    def linhas(self):
+        valor = self._ler()
+        if isinstance(valor, (int, float)):
+            valores = [((), valor)]
+        else:
+            valores = [(tuple(zip(self.rotulos, r)), v) for r, v in valor]
+        return linhas_simples(self.nome, self.ajuda, self.tipo, valores)
+
+class Registro:
+    def __init__(self):
+        self._metricas = []
+        self._coletores = []
+
+    def adicionar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    # coletor() -> lista de linhas já formatadas (ex.: métricas dos processos de detecção)
+    def coletor(self, funcao):
+        self._coletores.append(funcao)
+        return funcao
+
+    def renderizar(self):
+        linhas = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.linhas())
+        for coletor in self._coletores:
+            try:
+                linhas.extend(coletor())
+            except Exception as e:
+                linhas.append(f'# [ERRO] coletor {coletor.__name__}: {_escapar(e)}')
+        return '\n'.join(linhas) + '\n'
+
+# --- Métricas dos processos de detecção, em memória compartilhada ---
+# Cada WorkerDeteccao cria um Array('d') com o layout abaixo e o passa aos processos de captura
+# e inferência; cada histograma/contador tem um único processo escritor. A API lê e exporta
+# com o rótulo user_id. O último campo pede um perfil sob demanda (ver AmostradorPerfil).
+HISTOGRAMAS_DETECCAO = {
+    'frame_leitura': ('Tempo de leitura de um frame da câmera (cap.read), em segundos.', BALDES_PADRAO),
+    'jpeg_codificacao': ('Tempo de codificação JPEG de um frame, em segundos.', BALDES_PADRAO),
+    'redimensionamento': ('Tempo de redução do frame para PROCESS_SCALE, em segundos.', BALDES_PADRAO),
+    'inferencia': ('Tempo de uma inferência de emoção (detecção + classificação), em segundos.', BALDES_PADRAO),
+    'confirmacao': ('Tempo entre a primeira detecção de uma emoção nova e a confirmação, em segundos.', BALDES_CONFIRMACAO),
+}
+CONTADORES_DETECCAO = {
+    'reconexoes': 'Reconexões da câmera RTSP.',
+    'frames_descartados': 'Frames sobrescritos no anel antes de chegar à inferência.',
+}
+# Contadores que o worker já mantinha (supervisor.CONTADORES), exportados como estão
+CONTADORES_WORKER = {
+    'frames_capturados': 'Frames lidos da câmera e escritos no anel.',
+    'frames_consumidos': 'Frames entregues ao pipeline de inferência.',
+    'inferencias': 'Inferências de emoção executadas.',
+    'pulados_sem_mudanca': 'Inferências evitadas porque a cena não mudou.',
+    'pulados_sem_rosto': 'Inferências evitadas porque o Haar não achou rosto.',
+}
+
+def _layout():
+    posicoes = {}
+    posicao = 0
+    for nome, (_, baldes) in HISTOGRAMAS_DETECCAO.items():
+        posicoes[nome] = posicao
+        posicao += len(baldes) + 2
+    for nome in CONTADORES_DETECCAO:
+        posicoes[nome] = posicao
+        posicao += 1
+    posicoes['perfil_ate'] = posicao
+    return posicoes, posicao + 1
+
+_POSICOES, TAMANHO_DETECCAO = _layout()
+
+class MetricasDeteccao:
+    def __init__(self, valores):
+        self.valores = valores
+
+    def observar(self, nome, segundos):
+        _, baldes = HISTOGRAMAS_DETECCAO[nome]
+        inicio = _POSICOES[nome]
+        for i, limite in enumerate(baldes):
+            if segundos <= limite:
+                self.valores[inicio + i] += 1
+        self.valores[inicio + len(baldes)] += segundos
+        self.valores[inicio + len(baldes) + 1] += 1
+
+    def incrementar(self, nome, valor=1):
+        self.valores[_POSICOES[nome]] += valor
+
+    def serie(self, nome):
+        _, baldes = HISTOGRAMAS_DETECCAO[nome]
+        inicio = _POSICOES[nome]
+        return list(self.valores[inicio:inicio + len(baldes) + 2])
+
+    def valor(self, nome):
+        return self.valores[_POSICOES[nome]]
+
+    def solicitar_perfil(self, segundos):
+        self.valores[_POSICOES['perfil_ate']] = time.time() + segundos
+
+    @property
+    def perfil_ate(self):
+        return self.valores[_POSICOES['perfil_ate']]
+
+# workers: [(user_id, MetricasDeteccao, contadores), ...] (ver SupervisorDeteccao.metricas)
+def linhas_deteccao(workers):
+    linhas = []
+    for nome, (ajuda, baldes) in HISTOGRAMAS_DETECCAO.items():
+        series = [((('user_id', user_id),), m.serie(nome)) for user_id, m, _ in workers]
+        linhas.extend(linhas_histograma(f'{PREFIXO}{nome}_segundos', ajuda, baldes, series))
+    for nome, ajuda in CONTADORES_DETECCAO.items():
+        valores = [((('user_id', user_id),), m.valor(nome)) for user_id, m, _ in workers]
+        linhas.extend(linhas_simples(f'{PREFIXO}{nome}_total', ajuda, 'counter', valores))
+    for nome, ajuda in CONTADORES_WORKER.items():
+        valores = [((('user_id', user_id),), c[nome]) for user_id, _, c in workers]
+        linhas.extend(linhas_simples(f'{PREFIXO}{nome}_total', ajuda, 'counter', valores))
+    valores = [((('user_id', user_id),), c['pronto']) for user_id, _, c in workers]
+    linhas.extend(linhas_simples(f'{PREFIXO}deteccao_pronto', '1 quando o modelo do worker está aquecido.', 'gauge', valores))
+    return linhas
+
+# Exportador HTTP mínimo para processos sem Flask servindo (serviço de detecção separado)
+def servir_http(registro, porta, host='0.0.0.0'):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Manipulador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            corpo = registro.renderizar().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', TIPO_CONTEUDO)
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, porta), Manipulador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+    print(f"[INFO] Métricas em http://{host}:{porta}/metrics.")
+    return servidor
+
+# --- Perfil sob demanda do processo de inferência ---
+# Uma thread dorme até alguém pedir um perfil (MetricasDeteccao.solicitar_perfil); então amostra a
+# pilha da thread principal a cada `intervalo` segundos e grava as pilhas no formato "collapsed"
+# (uma linha "f1;f2;f3 N" por pilha), que o flamegraph.pl e o speedscope abrem direto.
+# Sem PERFIL_HABILITADO=1 a thread nem é criada nos processos de inferência.
+PERFIL_HABILITADO = os.environ.get('PERFIL_HABILITADO') == '1'
+PASTA_PERFIS = os.environ.get('DETECCAO_PERFIS', 'perfis')
+class AmostradorPerfil:
+    def __init__(self, metricas, pasta, nome, intervalo=0.01):
+        self._metricas = metricas
+        self._pasta = pasta
+        self._nome = nome
+        self._intervalo = intervalo
+        self._alvo = threading.main_thread().ident
+
+    def iniciar(self):
+        threading.Thread(target=self._loop, name="amostrador-perfil", daemon=True).start()
+
+    def _loop(self):
+        while True:
+            if self._metricas.perfil_ate <= time.time():
+                time.sleep(0.5)
+                continue
+            pilhas = Counter()
+            while time.time() < self._metricas.perfil_ate:
+                frame = sys._current_frames().get(self._alvo)
+                pilha = []
+                while frame is not None:
+                    codigo = frame.f_code
+                    pilha.append(f'{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{frame.f_lineno})')
+                    frame = frame.f_back
+                if pilha:
+                    pilhas[';'.join(reversed(pilha))] += 1
+                time.sleep(self._intervalo)
+            self._gravar(pilhas)
+
+    def _gravar(self, pilhas):
+        os.makedirs(self._pasta, exist_ok=True)
+        caminho = os.path.join(self._pasta, f'{self._nome}_{time.strftime("%Y%m%d_%H%M%S")}.txt')
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            for pilha, n in pilhas.most_common():
+                arquivo.write(f'{pilha} {n}\n')
+        print(f"[OK] Perfil gravado em {caminho} ({sum(pilhas.values())} amostras).")
@@ -0,0 +1,82 @@
+"""esquema inicial (as tabelas que o db.create_all() da versão original criava)
+
+Revision ID: 3f1c2a9d0b7e
+Revises: 
+Create Date: 2026-10-17 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d0b7e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# Bancos criados antes das migrações (pelo db.create_all() na importação) já têm estas
+# tabelas e não têm alembic_version: as que existem são puladas, então `flask db upgrade`
+# serve tanto para um banco novo quanto para um antigo.
+def upgrade():
+    existentes = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'usuario' not in existentes:
+        op.create_table('usuario',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('nome_completo', sa.String(length=255), nullable=False),
+            sa.Column('email', sa.String(length=255), nullable=False),
+            sa.Column('senha_hash', sa.String(length=255), nullable=False),
+            sa.Column('codigo_urso', sa.String(length=120), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email')
+        )
+    if 'codigo_urso' not in existentes:
+        op.create_table('codigo_urso',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('codigo', sa.String(length=120), nullable=False),
+            sa.Column('usado', sa.Boolean(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('codigo')
+        )
+    if 'musica' not in existentes:
+        op.create_table('musica',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(length=255), nullable=False),
+            sa.Column('artist', sa.String(length=255), nullable=True),
+            sa.Column('audio_url', sa.String(length=255), nullable=False),
+            sa.Column('is_deletable', sa.Boolean(), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['usuario.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if 'humor_event' not in existentes:
+        op.create_table('humor_event',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('data_hora', sa.String(length=80), nullable=False),
+            sa.Column('duracao', sa.Float(), nullable=True),
+            sa.Column('humor', sa.String(length=80), nullable=False),
+            sa.Column('mudanca', sa.String(length=80), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['usuario.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if 'selecao_musica' not in existentes:
+        op.create_table('selecao_musica',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('selected_type', sa.String(length=10), nullable=False),
+            sa.Column('selected_music_id', sa.String(length=255), nullable=True),
+            sa.Column('selected_music_url', sa.String(length=255), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['usuario.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id')
+        )
+
+
+def downgrade():
+    op.drop_table('selecao_musica')
+    op.drop_table('humor_event')
+    op.drop_table('musica')
+    op.drop_table('codigo_urso')
+    op.drop_table('usuario')
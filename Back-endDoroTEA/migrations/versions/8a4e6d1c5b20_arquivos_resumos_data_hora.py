@@ -0,0 +1,130 @@
+"""arquivos de áudio, resumos de humor, mudanças de música e humor_event.data_hora em DATETIME
+
+Revision ID: 8a4e6d1c5b20
+Revises: 3f1c2a9d0b7e
+Create Date: 2026-10-17 11:45:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4e6d1c5b20'
+down_revision = '3f1c2a9d0b7e'
+branch_labels = None
+depends_on = None
+
+
+# Versões anteriores da API aplicavam parte destas mudanças sozinhas ao iniciar, então cada
+# passo confere o banco antes: um banco já parcialmente atualizado também chega à head.
+def upgrade():
+    inspetor = sa.inspect(op.get_bind())
+    tabelas = set(inspetor.get_table_names())
+
+    if 'arquivo_audio' not in tabelas:
+        op.create_table('arquivo_audio',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('sha256', sa.String(length=64), nullable=False),
+            sa.Column('nome_arquivo', sa.String(length=255), nullable=False),
+            sa.Column('tamanho', sa.Integer(), nullable=False),
+            sa.Column('referencias', sa.Integer(), nullable=False),
+            sa.Column('transcodificacao', sa.String(length=20), nullable=True),
+            sa.Column('duracao', sa.Float(), nullable=True),
+            sa.Column('nome_otimizado', sa.String(length=255), nullable=True),
+            sa.Column('tamanho_otimizado', sa.Integer(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('sha256')
+        )
+    else:
+        colunas = {c['name'] for c in inspetor.get_columns('arquivo_audio')}
+        with op.batch_alter_table('arquivo_audio') as batch_op:
+            for coluna in (sa.Column('transcodificacao', sa.String(length=20), nullable=True),
+                           sa.Column('duracao', sa.Float(), nullable=True),
+                           sa.Column('nome_otimizado', sa.String(length=255), nullable=True),
+                           sa.Column('tamanho_otimizado', sa.Integer(), nullable=True)):
+                if coluna.name not in colunas:
+                    batch_op.add_column(coluna)
+
+    if 'camera_url' not in {c['name'] for c in inspetor.get_columns('codigo_urso')}:
+        with op.batch_alter_table('codigo_urso') as batch_op:
+            batch_op.add_column(sa.Column('camera_url', sa.String(length=255), nullable=True))
+
+    if 'arquivo_id' not in {c['name'] for c in inspetor.get_columns('musica')}:
+        with op.batch_alter_table('musica') as batch_op:
+            batch_op.add_column(sa.Column('arquivo_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_musica_arquivo_id_arquivo_audio', 'arquivo_audio', ['arquivo_id'], ['id'])
+
+    if 'humor_resumo' not in tabelas:
+        op.create_table('humor_resumo',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('granularidade', sa.String(length=10), nullable=False),
+            sa.Column('inicio', sa.DateTime(), nullable=False),
+            sa.Column('humor', sa.String(length=80), nullable=False),
+            sa.Column('duracao_total', sa.Float(), nullable=False),
+            sa.Column('transicoes', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['usuario.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'granularidade', 'inicio', 'humor', name='uq_humor_resumo_balde')
+        )
+
+    if 'mudanca_musica' not in tabelas:
+        op.create_table('mudanca_musica',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('tipo', sa.String(length=20), nullable=False),
+            sa.Column('musica_id', sa.Integer(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if 'ix_mudanca_musica_user_id_id' not in {i['name'] for i in sa.inspect(op.get_bind()).get_indexes('mudanca_musica')}:
+        op.create_index('ix_mudanca_musica_user_id_id', 'mudanca_musica', ['user_id', 'id'], unique=False)
+
+    # data_hora era VARCHAR. A tabela é recriada à mão (e não com batch_alter_table) porque o
+    # CAST do SQLite transformaria 'AAAA-MM-DD ...' em número; os textos antigos
+    # 'AAAA-MM-DD HH:MM:SS' ganham microssegundos, o formato que o SQLAlchemy grava.
+    colunas = {c['name']: c['type'] for c in inspetor.get_columns('humor_event')}
+    if not isinstance(colunas['data_hora'], sa.DateTime):
+        op.create_table('humor_event_nova',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('data_hora', sa.DateTime(), nullable=False),
+            sa.Column('duracao', sa.Float(), nullable=True),
+            sa.Column('humor', sa.String(length=80), nullable=False),
+            sa.Column('mudanca', sa.String(length=80), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['usuario.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.execute(
+            "INSERT INTO humor_event_nova (id, data_hora, duracao, humor, mudanca, user_id) "
+            "SELECT id, CASE WHEN length(data_hora) = 19 THEN data_hora || '.000000' ELSE data_hora END, "
+            "duracao, humor, mudanca, user_id FROM humor_event"
+        )
+        op.drop_table('humor_event')
+        op.rename_table('humor_event_nova', 'humor_event')
+
+    indices = {i['name'] for i in sa.inspect(op.get_bind()).get_indexes('humor_event')}
+    if 'ix_humor_event_data_hora' not in indices:
+        op.create_index('ix_humor_event_data_hora', 'humor_event', ['data_hora'], unique=False)
+    # Consultas por usuário + intervalo de tempo (ex.: /eventos?user_id=1&desde=...)
+    if 'ix_humor_event_user_id_data_hora' not in indices:
+        op.create_index('ix_humor_event_user_id_data_hora', 'humor_event', ['user_id', 'data_hora'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_humor_event_user_id_data_hora', table_name='humor_event')
+    op.drop_index('ix_humor_event_data_hora', table_name='humor_event')
+    with op.batch_alter_table('humor_event') as batch_op:
+        batch_op.alter_column('data_hora', existing_type=sa.DateTime(), type_=sa.String(length=80),
+                              existing_nullable=False)
+
+    op.drop_index('ix_mudanca_musica_user_id_id', table_name='mudanca_musica')
+    op.drop_table('mudanca_musica')
+    op.drop_table('humor_resumo')
+
+    with op.batch_alter_table('musica') as batch_op:
+        batch_op.drop_constraint('fk_musica_arquivo_id_arquivo_audio', type_='foreignkey')
+        batch_op.drop_column('arquivo_id')
+    with op.batch_alter_table('codigo_urso') as batch_op:
+        batch_op.drop_column('camera_url')
+    op.drop_table('arquivo_audio')
@@ -0,0 +1,43 @@
+from collections import defaultdict
+from datetime import timedelta
+
+# --- Resumos (rollups) de humor por hora e por dia ---
+# Cada HumorEvent marca a troca mudanca -> humor em data_hora, e duracao é quanto tempo o
+# humor anterior (mudanca) durou até ali. Então o intervalo [data_hora - duracao, data_hora]
+# conta como tempo em `mudanca`, e a transição conta para `humor` no balde de data_hora.
+GRANULARIDADES = {
+    'hora': timedelta(hours=1),
+    'dia': timedelta(days=1),
+}
+
+def inicio_balde(momento, granularidade):
+    if granularidade == 'hora':
+        return momento.replace(minute=0, second=0, microsecond=0)
+    return momento.replace(hour=0, minute=0, second=0, microsecond=0)
+
+# Divide [inicio, fim) nos baldes da granularidade; gera (inicio_do_balde, segundos)
+def dividir_intervalo(inicio, fim, granularidade):
+    passo = GRANULARIDADES[granularidade]
+    balde = inicio_balde(inicio, granularidade)
+    while balde < fim:
+        proximo = balde + passo
+        segundos = (min(fim, proximo) - max(inicio, balde)).total_seconds()
+        if segundos > 0:
+            yield balde, segundos
+        balde = proximo
+
+# Soma uma lista de eventos (dicts com user_id, data_hora, humor, mudanca, duracao) em
+# {(user_id, granularidade, inicio, humor): [duracao_total, transicoes]}
+def acumular(eventos, acumulado=None):
+    if acumulado is None:
+        acumulado = defaultdict(lambda: [0.0, 0])
+    for evento in eventos:
+        fim = evento['data_hora']
+        for granularidade in GRANULARIDADES:
+            chave = (evento['user_id'], granularidade, inicio_balde(fim, granularidade), evento['humor'])
+            acumulado[chave][1] += 1
+            if evento.get('mudanca') and evento.get('duracao'):
+                inicio = fim - timedelta(seconds=evento['duracao'])
+                for balde, segundos in dividir_intervalo(inicio, fim, granularidade):
+                    acumulado[(evento['user_id'], granularidade, balde, evento['mudanca'])][0] += segundos
+    return acumulado
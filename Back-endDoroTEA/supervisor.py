@@ -0,0 +1,276 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+
+from memoria import AnelFrames, nome_segmento
+from metricas import TAMANHO_DETECCAO, MetricasDeteccao
+from video import CanalVideo
+
+# Orçamento global de inferência, em segundos de inferência por segundo somando todas as câmeras
+# (None = 75% dos núcleos). Acima dele todos os workers são desacelerados pelo mesmo fator.
+INFERENCE_BUDGET = None
+MAX_GLOBAL_THROTTLE = 8.0
+
+# Anel de frames entre captura e inferência: posições e tamanho máximo de um frame (BGR).
+# Frames maiores que ANEL_MAX_BYTES são reduzidos antes de entrar no anel.
+ANEL_SLOTS = 4
+ANEL_MAX_BYTES = 1920 * 1080 * 3
+
+# Contadores por worker, compartilhados com o processo da API (ver WorkerDeteccao.status).
+# pronto = 1 depois que o processo de inferência aqueceu o modelo (ver /pronto)
+CONTADORES = ['frames_capturados', 'frames_consumidos', 'inferencias', 'pulados_sem_mudanca', 'pulados_sem_rosto', 'inferencia_ms',
+              'pronto', 'aquecimento_ms']
+
+# Alvo dos processos filhos: só o filho importa deteccao (e com ele cv2/FER), então quem
+# cria o supervisor (a API) continua leve.
+def _executar(funcao, *args):
+    import deteccao
+    getattr(deteccao, funcao)(*args)
+
+# --- Supervisor: um processo de detecção por urso/usuário ---
+# Cada urso tem dois processos: captura (câmera + JPEG) e inferência (FER). O worker é dono
+# dos segmentos compartilhados (anel de frames e canal de vídeo), que sobrevivem aos reinícios
+# dos processos e só são apagados em fechar().
+class WorkerDeteccao:
+    def __init__(self, ctx, user_id, camera_url, fila_eventos, fator_global=None):
+        self.user_id = user_id
+        self.camera_url = camera_url
+        self.anel = AnelFrames(nome_segmento('anel', user_id), ANEL_SLOTS, ANEL_MAX_BYTES, criar=True)
+        self.video = CanalVideo(nome_segmento('video', user_id), criar=True)
+        self.contadores = ctx.Array('q', len(CONTADORES), lock=False)
+        # Histogramas por etapa (ver metricas.py); sobrevivem aos reinícios dos processos
+        self.metricas = MetricasDeteccao(ctx.Array('d', TAMANHO_DETECCAO, lock=False))
+        self.reinicios = 0
+        self.proximo_reinicio = 0.0
+        self._ctx = ctx
+        self._fila_eventos = fila_eventos
+        self._fator_global = fator_global
+        self._parar = None
+        self._captura = None
+        self._processo = None
+
+    def iniciar(self):
+        self.anel.liberar()  # um leitor anterior pode ter morrido segurando uma posição
+        self.contadores[CONTADORES.index('pronto')] = 0
+        self._parar = self._ctx.Event()
+        self._captura = self._ctx.Process(
+            target=_executar,
+            args=('loop_captura', self.user_id, self.camera_url, self.anel.nome, self.video.nome, self.contadores, self._parar,
+                  self.metricas.valores),
+            name=f"captura-user-{self.user_id}",
+            daemon=True,
+        )
+        self._processo = self._ctx.Process(
+            target=_executar,
+            args=('loop_deteccao_continua', self.user_id, self.anel.nome, self._fila_eventos, self.contadores, self._fator_global, self._parar,
+                  self.metricas.valores),
+            name=f"deteccao-user-{self.user_id}",
+            daemon=True,
+        )
+        self._captura.start()
+        self._processo.start()
+
+    def parar(self, timeout=5.0):
+        if self._processo is None:
+            return
+        self._parar.set()
+        for processo in (self._captura, self._processo):
+            processo.join(timeout)
+            if processo.is_alive():
+                print(f"[ERRO] Processo {processo.name} não encerrou a tempo; forçando término.")
+                processo.terminate()
+                processo.join(1.0)
+
+    def fechar(self):
+        self.parar()
+        self.anel.fechar()
+        self.video.fechar()
+
+    @property
+    def vivo(self):
+        return all(p is not None and p.is_alive() for p in (self._captura, self._processo))
+
+    @property
+    def pronto(self):
+        return self.vivo and self.contadores[CONTADORES.index('pronto')] == 1
+
+    def status(self):
+        return {
+            'user_id': self.user_id,
+            'camera_url': self.camera_url,
+            'pid_captura': self._captura.pid if self._captura else None,
+            'pid': self._processo.pid if self._processo else None,
+            'vivo': self.vivo,
+            'pronto': self.pronto,
+            'reinicios': self.reinicios,
+            'contadores': self.contadores_dict(),
+        }
+
+    def contadores_dict(self):
+        contadores = dict(zip(CONTADORES, self.contadores))
+        pulados = contadores['pulados_sem_mudanca'] + contadores['pulados_sem_rosto']
+        total = pulados + contadores['inferencias']
+        contadores['inferencias_evitadas_pct'] = round(100.0 * pulados / total, 1) if total else 0.0
+        return contadores
+
+class SupervisorDeteccao:
+    # listar_ursos() -> {user_id: camera_url} com os ursos que devem ser monitorados.
+    # ao_evento(evento) é chamado no processo da API para cada emoção confirmada.
+    def __init__(self, listar_ursos, ao_evento, intervalo=10.0, max_processos=None, backoff_max=60.0,
+                 orcamento_inferencia=INFERENCE_BUDGET):
+        self._listar_ursos = listar_ursos
+        self._ao_evento = ao_evento
+        self._intervalo = intervalo
+        self._max_processos = max_processos
+        self._backoff_max = backoff_max
+        # 'spawn' evita herdar o estado do Flask/SQLite e do TensorFlow via fork
+        self._ctx = mp.get_context('spawn')
+        self._orcamento = orcamento_inferencia or 0.75 * mp.cpu_count()
+        self._fator_global = self._ctx.Value('d', 1.0, lock=False)
+        self._uso_inferencia = 0.0
+        self._fila_eventos = None
+        self._workers = {}
+        self._pausados = set()
+        self._lock = threading.Lock()
+        self._ativo = threading.Event()
+
+    def iniciar(self):
+        if self._ativo.is_set():
+            return
+        self._ativo.set()
+        self._fila_eventos = self._ctx.Queue()
+        threading.Thread(target=self._consumir_eventos, name="supervisor-eventos", daemon=True).start()
+        threading.Thread(target=self._monitorar, name="supervisor-monitor", daemon=True).start()
+        threading.Thread(target=self._regular_orcamento, name="supervisor-orcamento", daemon=True).start()
+        print("[INFO] Supervisor de detecção iniciado.")
+
+    def encerrar(self):
+        self._ativo.clear()
+        with self._lock:
+            for worker in self._workers.values():
+                worker.fechar()
+            self._workers.clear()
+
+    def _consumir_eventos(self):
+        while self._ativo.is_set():
+            try:
+                evento = self._fila_eventos.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            try:
+                self._ao_evento(evento)
+            except Exception as e:
+                print(f"[ERRO] Falha ao processar evento do user {evento.get('user_id')}: {str(e)}")
+
+    def _monitorar(self):
+        while self._ativo.is_set():
+            try:
+                self.sincronizar()
+            except Exception as e:
+                print(f"[ERRO] Supervisor de detecção: {str(e)}")
+            time.sleep(self._intervalo)
+
+    # Mede o tempo de inferência somado de todos os workers e ajusta o fator global de desaceleração
+    def _regular_orcamento(self, periodo=1.0):
+        indice = CONTADORES.index('inferencia_ms')
+        anteriores = {}
+        while self._ativo.is_set():
+            time.sleep(periodo)
+            with self._lock:
+                atuais = {user_id: w.contadores[indice] for user_id, w in self._workers.items()}
+            gasto_ms = sum(max(0, ms - anteriores.get(user_id, ms)) for user_id, ms in atuais.items())
+            anteriores = atuais
+            self._uso_inferencia = gasto_ms / 1000.0 / periodo
+
+            fator = self._fator_global.value
+            if self._uso_inferencia > self._orcamento:
+                fator = min(MAX_GLOBAL_THROTTLE, fator * 1.25)
+            elif self._uso_inferencia < 0.7 * self._orcamento:
+                fator = max(1.0, fator / 1.25)
+            if fator != self._fator_global.value:
+                print(f"[INFO] Uso de inferência {self._uso_inferencia:.2f}/{self._orcamento:.2f}; fator global de intervalo = {fator:.2f}.")
+                self._fator_global.value = fator
+
+    def sincronizar(self):
+        if not self._ativo.is_set():
+            return
+        desejados = self._listar_ursos()
+        agora = time.time()
+        with self._lock:
+            for user_id in list(self._workers):
+                worker = self._workers[user_id]
+                if user_id not in desejados or user_id in self._pausados or worker.camera_url != desejados[user_id]:
+                    print(f"[INFO] Encerrando worker de detecção do user {user_id}.")
+                    worker.fechar()
+                    del self._workers[user_id]
+
+            for user_id, camera_url in desejados.items():
+                if user_id in self._pausados:
+                    continue
+                worker = self._workers.get(user_id)
+                if worker is None:
+                    if self._max_processos and len(self._workers) >= self._max_processos:
+                        print(f"[ERRO] Limite de {self._max_processos} processos de detecção atingido; user {user_id} sem worker.")
+                        continue
+                    worker = WorkerDeteccao(self._ctx, user_id, camera_url, self._fila_eventos, self._fator_global)
+                    self._workers[user_id] = worker
+                    worker.iniciar()
+                elif not worker.vivo and agora >= worker.proximo_reinicio:
+                    # Reinício com backoff exponencial para câmeras/processos que caem repetidamente
+                    worker.reinicios += 1
+                    worker.proximo_reinicio = agora + min(self._backoff_max, 2 ** worker.reinicios)
+                    print(f"[ERRO] Worker do user {user_id} caiu; reiniciando (tentativa {worker.reinicios}).")
+                    worker.parar()  # se só um dos dois processos caiu, o outro também é reiniciado
+                    worker.iniciar()
+
+    def iniciar_worker(self, user_id):
+        with self._lock:
+            self._pausados.discard(user_id)
+        self.sincronizar()
+
+    def parar_worker(self, user_id):
+        with self._lock:
+            self._pausados.add(user_id)
+        self.sincronizar()
+
+    def reiniciar_worker(self, user_id):
+        with self._lock:
+            worker = self._workers.pop(user_id, None)
+            if worker is not None:
+                worker.fechar()
+        self.iniciar_worker(user_id)
+
+    # Pronto = supervisor ativo e todos os workers vivos com o modelo aquecido
+    def pronto(self):
+        with self._lock:
+            return self._ativo.is_set() and all(w.pronto for w in self._workers.values())
+
+    # [(user_id, MetricasDeteccao, contadores), ...] para o /metrics
+    def metricas(self):
+        with self._lock:
+            return [(w.user_id, w.metricas, w.contadores_dict()) for w in self._workers.values()]
+
+    # Pede ao processo de inferência um perfil de `segundos` (ver metricas.AmostradorPerfil)
+    def solicitar_perfil(self, user_id, segundos):
+        worker = self._workers.get(user_id)
+        if worker is None or not worker.vivo:
+            return False
+        worker.metricas.solicitar_perfil(segundos)
+        return True
+
+    def canal_video(self, user_id):
+        worker = self._workers.get(user_id)
+        return worker.video if worker else None
+
+    def status(self):
+        with self._lock:
+            return {
+                'ativo': self._ativo.is_set(),
+                'max_processos': self._max_processos,
+                'orcamento_inferencia': self._orcamento,
+                'uso_inferencia': round(self._uso_inferencia, 3),
+                'fator_global': self._fator_global.value,
+                'pausados': sorted(self._pausados),
+                'workers': [w.status() for w in self._workers.values()],
+            }
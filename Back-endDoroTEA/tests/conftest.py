@@ -0,0 +1,44 @@
+import itertools
+import os
+import sys
+
+import pytest
+
+PASTA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PASTA_BACKEND not in sys.path:
+    sys.path.insert(0, PASTA_BACKEND)
+
+# Api lê DATABASE_URL e as pastas relativas (uploads/ etc.) na importação: só a fixture `api`
+# importa o módulo, depois de apontar o banco e o diretório atual para uma pasta temporária.
+@pytest.fixture(scope='session')
+def api(tmp_path_factory):
+    pasta = tmp_path_factory.mktemp('api')
+    anterior = os.getcwd()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + str(pasta / 'urso.db')
+    os.chdir(pasta)
+    from flask_migrate import upgrade
+    import Api
+    with Api.app.app_context():
+        Api.obter_migrate()
+        upgrade()
+    Api.criar_app(iniciar_servicos=False)
+    yield Api
+    os.chdir(anterior)
+
+@pytest.fixture
+def cliente(api, monkeypatch):
+    # Sem ffmpeg em segundo plano mexendo nos arquivos de áudio durante o teste
+    monkeypatch.setattr(api.fila_transcodificacao, 'enviar', lambda arquivo_id: None)
+    return api.app.test_client()
+
+_contador_usuarios = itertools.count(1)
+
+@pytest.fixture
+def usuario(api):
+    indice = next(_contador_usuarios)
+    with api.app.app_context():
+        novo = api.Usuario(nome_completo=f'Usuário {indice}', email=f'usuario{indice}@teste.com',
+                           senha_hash='x', codigo_urso=f'URSO-TESTE-{indice}')
+        api.db.session.add(novo)
+        api.db.session.commit()
+        return {'id': novo.id, 'email': novo.email}
@@ -0,0 +1,155 @@
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def _enviar_musica(cliente, usuario, titulo, conteudo=b'ID3 bytes de teste'):
+    return cliente.post('/add_music', content_type='multipart/form-data', data={
+        'file': (io.BytesIO(conteudo), 'musica.mp3'),
+        'email': usuario['email'],
+        'title': titulo,
+        'artist': 'Artista',
+    })
+
+
+def _musica_id(api, usuario, titulo):
+    with api.app.app_context():
+        return api.Musica.query.filter_by(user_id=usuario['id'], title=titulo).one().id
+
+
+def _arquivo(api, sha):
+    with api.app.app_context():
+        arquivo = api.ArquivoAudio.query.filter_by(sha256=sha).first()
+        return None if arquivo is None else (arquivo.referencias, arquivo.nome_arquivo)
+
+
+# --- Contagem de referências dos arquivos de áudio ---
+def test_mesmo_conteudo_compartilha_um_arquivo(api, cliente, usuario):
+    conteudo = b'mesmo audio ' + os.urandom(16)
+    primeira = _enviar_musica(cliente, usuario, 'Primeira', conteudo)
+    segunda = _enviar_musica(cliente, usuario, 'Segunda', conteudo)
+    assert primeira.status_code == 201 and segunda.status_code == 201
+    sha = primeira.json['sha256']
+    assert segunda.json['sha256'] == sha
+
+    referencias, nome = _arquivo(api, sha)
+    assert referencias == 2
+    caminho = os.path.join(api.app.config['UPLOAD_FOLDER'], nome)
+    assert os.path.exists(caminho)
+
+    assert cliente.delete(f"/delete_music/{_musica_id(api, usuario, 'Primeira')}").status_code == 200
+    assert _arquivo(api, sha) == (1, nome)
+    assert os.path.exists(caminho)
+
+    # Sem nenhuma música usando o arquivo, ele sai do banco e do disco
+    assert cliente.delete(f"/delete_music/{_musica_id(api, usuario, 'Segunda')}").status_code == 200
+    assert _arquivo(api, sha) is None
+    assert not os.path.exists(caminho)
+
+
+def test_conteudos_diferentes_geram_arquivos_separados(api, cliente, usuario):
+    a = _enviar_musica(cliente, usuario, 'A', b'audio a ' + os.urandom(16)).json['sha256']
+    b = _enviar_musica(cliente, usuario, 'B', b'audio b ' + os.urandom(16)).json['sha256']
+    assert a != b
+    assert _arquivo(api, a)[0] == 1
+    assert _arquivo(api, b)[0] == 1
+
+
+# --- Manifesto incremental ---
+def test_manifesto_completo_e_delta(api, cliente, usuario):
+    _enviar_musica(cliente, usuario, 'Um', os.urandom(32))
+    completo = cliente.get(f"/manifesto/{usuario['id']}")
+    assert completo.status_code == 200
+    assert completo.json['desde'] == 0
+    assert [m['title'] for m in completo.json['adicionadas']] == ['Um']
+    versao = completo.json['versao']
+
+    # Nada mudou desde a versão do urso
+    sem_mudancas = cliente.get(f"/manifesto/{usuario['id']}?desde={versao}")
+    assert sem_mudancas.status_code == 204
+    assert sem_mudancas.headers['X-Manifesto-Versao'] == str(versao)
+
+    _enviar_musica(cliente, usuario, 'Dois', os.urandom(32))
+    delta = cliente.get(f"/manifesto/{usuario['id']}?desde={versao}")
+    assert delta.status_code == 200
+    assert [m['title'] for m in delta.json['adicionadas']] == ['Dois']
+    assert delta.json['removidas'] == []
+    assert delta.json['versao'] > versao
+
+    um = _musica_id(api, usuario, 'Um')
+    cliente.delete(f'/delete_music/{um}')
+    remocao = cliente.get(f"/manifesto/{usuario['id']}?desde={delta.json['versao']}")
+    assert remocao.json['adicionadas'] == []
+    assert remocao.json['removidas'] == [um]
+
+
+def test_manifesto_ignora_musica_adicionada_e_removida_na_mesma_janela(api, cliente, usuario):
+    _enviar_musica(cliente, usuario, 'Fica', os.urandom(32))
+    versao = cliente.get(f"/manifesto/{usuario['id']}").json['versao']
+
+    _enviar_musica(cliente, usuario, 'Passageira', os.urandom(32))
+    cliente.delete(f"/delete_music/{_musica_id(api, usuario, 'Passageira')}")
+    delta = cliente.get(f"/manifesto/{usuario['id']}?desde={versao}")
+    assert delta.status_code == 200
+    assert delta.json['adicionadas'] == []
+    assert delta.json['removidas'] == []
+
+
+def test_manifesto_com_versao_a_frente_do_servidor(api, cliente, usuario):
+    _enviar_musica(cliente, usuario, 'Única', os.urandom(32))
+    versao = cliente.get(f"/manifesto/{usuario['id']}").json['versao']
+    # Banco restaurado de um backup: o urso recebe o manifesto completo de novo
+    resposta = cliente.get(f"/manifesto/{usuario['id']}?desde={versao + 1000}")
+    assert resposta.status_code == 200
+    assert resposta.json['desde'] == 0
+    assert [m['title'] for m in resposta.json['adicionadas']] == ['Única']
+
+
+# --- /eventos com paginação por cursor ---
+@pytest.fixture
+def eventos(api, usuario):
+    inicio = datetime(2025, 3, 10, 14, 0)
+    with api.app.app_context():
+        for i in range(25):
+            # Pares com o mesmo horário: o id desempata a ordem e o cursor
+            api.db.session.add(api.HumorEvent(data_hora=inicio + timedelta(seconds=i // 2), duracao=1.0,
+                                              humor='happy' if i % 3 else 'sad', mudanca=None, user_id=usuario['id']))
+        api.db.session.commit()
+        return [(e.data_hora, e.id) for e in api.HumorEvent.query.filter_by(user_id=usuario['id']).all()]
+
+
+def test_eventos_percorre_todas_as_paginas(cliente, usuario, eventos):
+    vistos, cursor, paginas = [], None, 0
+    while True:
+        url = f"/eventos?user_id={usuario['id']}&limite=10&campos=id,data_hora"
+        resposta = cliente.get(url + (f'&cursor={cursor}&contar=0' if cursor else ''))
+        assert resposta.status_code == 200
+        paginas += 1
+        if cursor is None:
+            assert resposta.json['total_eventos'] == 25
+        else:
+            assert 'total_eventos' not in resposta.json
+        vistos += [e['id'] for e in resposta.json['eventos']]
+        cursor = resposta.json['proximo_cursor']
+        if cursor is None:
+            break
+    assert paginas == 3
+    esperado = [evento_id for _, evento_id in sorted(eventos, reverse=True)]
+    assert vistos == esperado
+
+
+def test_eventos_filtra_por_humor_e_intervalo(cliente, usuario, eventos):
+    resposta = cliente.get(f"/eventos?user_id={usuario['id']}&humor=sad"
+                           f"&desde=2025-03-10T14:00:03&ate=2025-03-10T14:00:09")
+    datas = [e['data_hora'] for e in resposta.json['eventos']]
+    assert resposta.json['total_eventos'] == len(datas) == 4
+    assert all('2025-03-10 14:00:03' <= d < '2025-03-10 14:00:09' for d in datas)
+    assert {e['humor'] for e in resposta.json['eventos']} == {'sad'}
+
+
+def test_eventos_cursor_invalido(cliente, usuario):
+    resposta = cliente.get(f"/eventos?user_id={usuario['id']}&cursor=invalido")
+    assert resposta.status_code == 400
+    assert 'erro' in resposta.json
@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+import pytest
+
+from deteccao import AgendadorDeteccao, MaquinaPersistencia
+
+
+def test_confirma_depois_de_persistence_count_deteccoes():
+    maquina = MaquinaPersistencia(persistence_count=3, inicio_tempo=100.0)
+    assert maquina.registrar('happy', 101.0) is None
+    assert maquina.registrar('happy', 102.0) is None
+    assert maquina.registrar('happy', 103.0) == ('happy', None, 3.0)
+    assert maquina.humor_anterior == 'happy'
+    assert maquina.espera_confirmacao == 2.0
+
+
+def test_oscilacao_reinicia_a_contagem():
+    maquina = MaquinaPersistencia(persistence_count=3, inicio_tempo=0.0)
+    for humor, agora in (('sad', 1.0), ('sad', 2.0), ('angry', 3.0), ('sad', 4.0), ('sad', 5.0)):
+        assert maquina.registrar(humor, agora) is None
+    assert maquina.registrar('sad', 6.0) == ('sad', None, 6.0)
+    assert maquina.espera_confirmacao == 2.0
+
+
+def test_duracao_e_humor_anterior_na_troca():
+    maquina = MaquinaPersistencia(persistence_count=2, inicio_tempo=0.0)
+    maquina.registrar('neutral', 1.0)
+    assert maquina.registrar('neutral', 2.0) == ('neutral', None, 2.0)
+    # Voltar ao humor confirmado descarta a emoção pendente
+    maquina.registrar('happy', 3.0)
+    assert maquina.registrar('neutral', 4.0) is None
+    assert maquina.pending_humor is None
+    maquina.registrar('happy', 10.0)
+    assert maquina.registrar('happy', 12.5) == ('happy', 'neutral', 10.5)
+
+
+def test_agendador_acelera_com_emocao_pendente():
+    agendador = AgendadorDeteccao(intervalo_base=1.0, intervalo_pendente=0.4, intervalo_max=4.0, backoff=2.0)
+    maquina = MaquinaPersistencia(persistence_count=3, inicio_tempo=0.0)
+    maquina.registrar('happy', 1.0)
+    agendador.atualizar(maquina, 'happy')
+    assert agendador.proximo_intervalo() == 0.4
+
+
+def test_agendador_espaca_enquanto_o_humor_segue_estavel():
+    agendador = AgendadorDeteccao(intervalo_base=1.0, intervalo_pendente=0.4, intervalo_max=4.0, backoff=2.0)
+    maquina = MaquinaPersistencia(persistence_count=2, inicio_tempo=0.0)
+    maquina.registrar('happy', 1.0)
+    maquina.registrar('happy', 2.0)
+    intervalos = []
+    for _ in range(4):
+        agendador.atualizar(maquina, 'happy')
+        intervalos.append(agendador.proximo_intervalo())
+    assert intervalos == [2.0, 4.0, 4.0, 4.0]
+
+    # Sem rosto (humor None) ou humor diferente do confirmado: volta ao intervalo base
+    agendador.atualizar(maquina, None)
+    assert agendador.proximo_intervalo() == 1.0
+
+
+def test_agendador_aplica_o_fator_global():
+    fator = SimpleNamespace(value=2.5)
+    agendador = AgendadorDeteccao(intervalo_base=1.0, fator_global=fator)
+    assert agendador.proximo_intervalo() == pytest.approx(2.5)
+    fator.value = 1.0
+    assert agendador.proximo_intervalo() == pytest.approx(1.0)
@@ -0,0 +1,74 @@
+import threading
+import time
+
+from fila_escrita import FilaEscrita
+
+
+class Gravador:
+    def __init__(self, falhas=0, pausa=0.0):
+        self.lotes = []
+        self.falhas = falhas
+        self.pausa = pausa
+        self.gravou = threading.Event()
+
+    def __call__(self, lote):
+        if self.falhas:
+            self.falhas -= 1
+            raise RuntimeError('banco travado')
+        time.sleep(self.pausa)
+        self.lotes.append(list(lote))
+        self.gravou.set()
+
+
+def test_lote_parcial_gravado_depois_do_intervalo():
+    gravador = Gravador()
+    fila = FilaEscrita(gravador, tamanho_lote=100, intervalo_flush=0.05)
+    for item in range(3):
+        assert fila.enfileirar(item)
+    assert gravador.gravou.wait(2.0)
+    assert gravador.lotes == [[0, 1, 2]]
+    fila.encerrar()
+
+
+def test_encerrar_drena_em_lotes_cheios():
+    # Gravador lento: a maior parte dos itens ainda está na fila quando o encerramento começa
+    gravador = Gravador(pausa=0.01)
+    fila = FilaEscrita(gravador, tamanho_lote=10, intervalo_flush=0.5)
+    for item in range(95):
+        fila.enfileirar(item)
+    fila.encerrar(timeout=5.0)
+    assert [item for lote in gravador.lotes for item in lote] == list(range(95))
+    assert [len(lote) for lote in gravador.lotes] == [10] * 9 + [5]
+    assert fila.status() == {'pendentes': 0, 'gravados': 95, 'lotes': len(gravador.lotes), 'descartados': 0}
+
+
+def test_lote_com_falha_e_repetido():
+    gravador = Gravador(falhas=2)
+    fila = FilaEscrita(gravador, tamanho_lote=5, intervalo_flush=0.01, tentativas=3)
+    fila.enfileirar('a')
+    fila.encerrar()
+    assert gravador.lotes == [['a']]
+    assert fila.status()['descartados'] == 0
+
+
+def test_lote_descartado_depois_das_tentativas():
+    gravador = Gravador(falhas=10)
+    fila = FilaEscrita(gravador, tamanho_lote=5, intervalo_flush=0.01, tentativas=2)
+    fila.enfileirar('a')
+    fila.enfileirar('b')
+    fila.encerrar()
+    assert gravador.lotes == []
+    assert fila.status()['descartados'] == 2
+
+
+def test_fila_cheia_descarta_sem_bloquear():
+    liberar = threading.Event()
+    fila = FilaEscrita(lambda lote: liberar.wait(5.0), tamanho_max=1, tamanho_lote=1,
+                       intervalo_flush=0.01, timeout_enfileirar=0.01)
+    fila.enfileirar(1)  # fica preso no gravador
+    time.sleep(0.1)
+    fila.enfileirar(2)  # ocupa a única posição da fila
+    assert not fila.enfileirar(3)
+    assert fila.status()['descartados'] == 1
+    liberar.set()
+    fila.encerrar()
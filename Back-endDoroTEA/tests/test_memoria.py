@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pytest
+
+from memoria import AnelFrames
+
+
+def _frame(valor, altura=4, largura=6):
+    return np.full((altura, largura, 3), valor, dtype=np.uint8)
+
+
+@pytest.fixture
+def anel(request):
+    nome = f'dorotea-teste-anel-{os.getpid()}-{request.node.name}'
+    escritor = AnelFrames(nome, slots=3, max_bytes=4 * 6 * 3, criar=True)
+    leitor = AnelFrames(nome)
+    yield escritor, leitor
+    leitor.fechar()
+    escritor.fechar()
+
+
+def test_leitor_recebe_o_frame_mais_recente(anel):
+    escritor, leitor = anel
+    escritor.escrever(_frame(1), 10.0)
+    escritor.escrever(_frame(2), 11.0)
+    seq, frame, timestamp = leitor.ler(timeout=0.1)
+    assert seq == 2
+    assert timestamp == 11.0
+    assert frame.shape == (4, 6, 3)
+    assert (frame == 2).all()
+
+
+def test_ler_sem_frame_novo_expira(anel):
+    escritor, leitor = anel
+    escritor.escrever(_frame(1), 10.0)
+    seq, _, _ = leitor.ler(timeout=0.1)
+    assert leitor.ler(apos_seq=seq, timeout=0.05) is None
+
+
+def test_escritor_nao_sobrescreve_o_slot_do_leitor(anel):
+    escritor, leitor = anel
+    escritor.escrever(_frame(7), 10.0)
+    seq, frame, _ = leitor.ler(timeout=0.1)
+    for valor in range(8, 20):
+        assert escritor.escrever(_frame(valor), float(valor)) is not None
+    # O frame entregue ao leitor continua intacto enquanto ele não libera o slot
+    assert (frame == 7).all()
+
+    novo_seq, novo_frame, _ = leitor.ler(apos_seq=seq, timeout=0.1)
+    assert (novo_frame == 19).all()
+    assert novo_seq == seq + 12
+
+
+def test_sem_slot_livre_o_frame_e_descartado(request):
+    nome = f'dorotea-teste-anel-{os.getpid()}-{request.node.name}'
+    escritor = AnelFrames(nome, slots=2, max_bytes=4 * 6 * 3, criar=True)
+    try:
+        escritor.escrever(_frame(1), 1.0)
+        escritor.ler(timeout=0.1)  # o leitor segura o slot 0
+        assert escritor.escrever(_frame(2), 2.0) == 2
+        # Sobram só o slot do leitor e o do último frame: nenhum pode ser sobrescrito
+        assert escritor.escrever(_frame(3), 3.0) is None
+        escritor.liberar()
+        assert escritor.escrever(_frame(3), 3.0) == 3
+    finally:
+        escritor.fechar()
+
+
+def test_frame_maior_que_o_slot(anel):
+    escritor, _ = anel
+    with pytest.raises(ValueError):
+        escritor.escrever(_frame(1, altura=8), 1.0)
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+import resumos
+
+
+def _evento(data_hora, humor, mudanca=None, duracao=None, user_id=1):
+    return {'user_id': user_id, 'data_hora': data_hora, 'humor': humor, 'mudanca': mudanca, 'duracao': duracao}
+
+
+def test_duracao_dividida_entre_baldes_de_hora():
+    acumulado = resumos.acumular([_evento(datetime(2025, 3, 10, 10, 0, 30), 'happy', 'neutral', 90.0)])
+    assert acumulado[(1, 'hora', datetime(2025, 3, 10, 9), 'neutral')] == [60.0, 0]
+    assert acumulado[(1, 'hora', datetime(2025, 3, 10, 10), 'neutral')] == [30.0, 0]
+    assert acumulado[(1, 'hora', datetime(2025, 3, 10, 10), 'happy')] == [0.0, 1]
+    assert acumulado[(1, 'dia', datetime(2025, 3, 10), 'neutral')] == [90.0, 0]
+    assert acumulado[(1, 'dia', datetime(2025, 3, 10), 'happy')] == [0.0, 1]
+
+
+def test_duracao_atravessa_a_meia_noite():
+    acumulado = resumos.acumular([_evento(datetime(2025, 3, 11, 0, 10), 'sad', 'happy', 1200.0)])
+    assert acumulado[(1, 'dia', datetime(2025, 3, 10), 'happy')] == [600.0, 0]
+    assert acumulado[(1, 'dia', datetime(2025, 3, 11), 'happy')] == [600.0, 0]
+    assert acumulado[(1, 'hora', datetime(2025, 3, 10, 23), 'happy')] == [600.0, 0]
+    assert acumulado[(1, 'hora', datetime(2025, 3, 11, 0), 'happy')] == [600.0, 0]
+
+
+def test_primeiro_evento_conta_so_a_transicao():
+    acumulado = resumos.acumular([_evento(datetime(2025, 3, 10, 8, 0), 'happy', None, 0.0)])
+    assert dict(acumulado) == {
+        (1, 'hora', datetime(2025, 3, 10, 8), 'happy'): [0.0, 1],
+        (1, 'dia', datetime(2025, 3, 10), 'happy'): [0.0, 1],
+    }
+
+
+def test_acumulado_soma_lotes_e_separa_usuarios():
+    acumulado = resumos.acumular([
+        _evento(datetime(2025, 3, 10, 8, 30), 'happy', 'sad', 600.0),
+        _evento(datetime(2025, 3, 10, 8, 40), 'happy', 'sad', 300.0, user_id=2),
+    ])
+    resumos.acumular([_evento(datetime(2025, 3, 10, 8, 50), 'sad', 'happy', 1200.0)], acumulado)
+    assert acumulado[(1, 'hora', datetime(2025, 3, 10, 8), 'sad')] == [600.0, 1]
+    assert acumulado[(1, 'hora', datetime(2025, 3, 10, 8), 'happy')] == [1200.0, 1]
+    assert acumulado[(2, 'hora', datetime(2025, 3, 10, 8), 'sad')] == [300.0, 0]
@@ -0,0 +1,100 @@
+import os
+import re
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Perfil de áudio para o ESP32 ---
+# Mono, 22,05 kHz, MP3 de 48 kbps com volume normalizado (EBU R128): arquivos pequenos,
+# fáceis de decodificar no urso e com volume parecido entre músicas diferentes.
+PERFIL_ESP32 = [
+    '-vn', '-ac', '1', '-ar', '22050',
+    '-af', 'loudnorm=I=-16:TP=-1.5:LRA=11',
+    '-codec:a', 'libmp3lame', '-b:a', '48k',
+]
+FFMPEG = shutil.which('ffmpeg')
+FFPROBE = shutil.which('ffprobe')
+
+def disponivel():
+    return FFMPEG is not None
+
+def duracao_audio(caminho):
+    if FFPROBE is not None:
+        saida = subprocess.run(
+            [FFPROBE, '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=nw=1:nk=1', caminho],
+            capture_output=True, text=True, timeout=60,
+        )
+        try:
+            return round(float(saida.stdout.strip()), 2)
+        except ValueError:
+            return None
+    if FFMPEG is None:
+        return None
+    # Sem ffprobe: lê o "Duration: HH:MM:SS.ss" que o ffmpeg imprime ao abrir o arquivo
+    saida = subprocess.run([FFMPEG, '-hide_banner', '-i', caminho], capture_output=True, text=True, timeout=60)
+    encontrado = re.search(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)', saida.stderr)
+    if not encontrado:
+        return None
+    horas, minutos, segundos = encontrado.groups()
+    return round(int(horas) * 3600 + int(minutos) * 60 + float(segundos), 2)
+
+# Converte `entrada` para o perfil do ESP32; retorna (duracao, tamanho) do arquivo gerado.
+# O temporário leva o pid e a thread, para duas conversões do mesmo arquivo não escreverem juntas.
+def transcodificar(entrada, saida, timeout=600):
+    os.makedirs(os.path.dirname(saida), exist_ok=True)
+    temporario = f"{saida}.{os.getpid()}-{threading.get_ident()}.part"
+    resultado = subprocess.run(
+        [FFMPEG, '-y', '-loglevel', 'error', '-i', entrada, *PERFIL_ESP32, '-f', 'mp3', temporario],
+        capture_output=True, text=True, timeout=timeout,
+    )
+    if resultado.returncode != 0:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise RuntimeError(resultado.stderr.strip() or f'ffmpeg saiu com código {resultado.returncode}')
+    os.replace(temporario, saida)
+    return duracao_audio(saida), os.path.getsize(saida)
+
+# Há um ffmpeg vivo gravando `saida`? (temporário de transcodificar() com o pid de um processo ativo)
+def em_andamento(saida):
+    pasta, nome = os.path.split(saida)
+    if not os.path.isdir(pasta):
+        return False
+    for temporario in os.listdir(pasta):
+        if not (temporario.startswith(nome + '.') and temporario.endswith('.part')):
+            continue
+        pid = temporario[len(nome) + 1:].split('-', 1)[0]
+        try:
+            os.kill(int(pid), 0)
+            return True
+        except PermissionError:
+            return True
+        except (ValueError, ProcessLookupError):
+            # Sobra de um processo que morreu
+            try:
+                os.remove(os.path.join(pasta, temporario))
+            except OSError:
+                pass
+    return False
+
+# --- Pool de transcodificação em segundo plano ---
+# tarefa(arquivo_id) faz o trabalho e grava o resultado; o upload nunca espera por ela.
+class FilaTranscodificacao:
+    def __init__(self, tarefa, max_workers=2):
+        self._tarefa = tarefa
+        self._max_workers = max_workers
+        self._executor = None
+        self._pendentes = set()
+
+    def enviar(self, arquivo_id):
+        if arquivo_id in self._pendentes:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix='transcodificacao')
+        self._pendentes.add(arquivo_id)
+        futuro = self._executor.submit(self._tarefa, arquivo_id)
+        futuro.add_done_callback(lambda _: self._pendentes.discard(arquivo_id))
+
+    def encerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
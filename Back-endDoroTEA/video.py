@@ -0,0 +1,145 @@
+import hashlib
+import time
+
+from memoria import anexar_segmento, criar_segmento
+
+# --- Níveis de qualidade do vídeo ---
+# nome: (largura máxima em px ou None para a resolução original, qualidade JPEG)
+QUALIDADES = {
+    'baixa': (320, 60),
+    'media': (640, 75),
+    'alta': (None, 90),
+}
+QUALIDADE_PADRAO = 'alta'
+NOMES_QUALIDADES = list(QUALIDADES)
+
+# Por quanto tempo um pedido de snapshot/stream mantém a codificação ligada no worker
+DEMANDA_TTL = 3.0
+
+def codificar_jpeg(frame, qualidade):
+    import cv2  # só o processo de captura codifica; a API lê os JPEGs prontos
+    largura_max, jpeg_q = QUALIDADES[qualidade]
+    if largura_max is not None and frame.shape[1] > largura_max:
+        escala = largura_max / frame.shape[1]
+        frame = cv2.resize(frame, (0, 0), fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+    ret_enc, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_q])
+    return buffer.tobytes() if ret_enc else None
+
+# Espaço reservado por qualidade no segmento de vídeo; JPEGs maiores são descartados
+TAMANHO_MAX_JPEG = {
+    'baixa': 256 * 1024,
+    'media': 512 * 1024,
+    'alta': 2 * 1024 * 1024,
+}
+
+# --- Lado da captura: codifica só as qualidades que alguém está assistindo ---
+def publicar_frame(frame, canal, metricas=None):
+    agora = time.time()
+    for qualidade in NOMES_QUALIDADES:
+        if not canal.demandado(qualidade, agora):
+            continue
+        inicio = time.perf_counter()
+        dados = codificar_jpeg(frame, qualidade)
+        if metricas is not None:
+            metricas.observar('jpeg_codificacao', time.perf_counter() - inicio)
+        if dados is not None:
+            canal.publicar(qualidade, dados)
+
+# --- Canal de vídeo de um urso em memória compartilhada ---
+# Para cada qualidade: cabeçalho (versão, tamanho, instante, demanda), ETag e a área do JPEG.
+# O processo de captura escreve; a API (inclusive vários workers de um servidor WSGI) anexa
+# pelo nome e lê o último JPEG sem passar os frames por pipe. Durante a escrita a versão fica
+# negativa, e o leitor confere se ela não mudou depois de copiar (seqlock).
+_ETAG_BYTES = 24
+
+class CanalVideo:
+    def __init__(self, nome, criar=False, rastrear=True):
+        import numpy as np  # sob demanda: a API importa este módulo sem precisar do numpy
+        self.nome = nome
+        self._dono = criar
+        n = len(NOMES_QUALIDADES)
+        self._inicio = []
+        posicao = 8 * 4 * (n + 1) + _ETAG_BYTES * n
+        for qualidade in NOMES_QUALIDADES:
+            self._inicio.append(posicao)
+            posicao += TAMANHO_MAX_JPEG[qualidade]
+        self._shm = criar_segmento(nome, posicao) if criar else anexar_segmento(nome, rastrear)
+        # Linha 0: [encerrado, -, -, -]; linha i + 1: [versao, tamanho, timestamp, demanda] da qualidade i
+        self._cab = np.ndarray((n + 1, 4), dtype=np.float64, buffer=self._shm.buf)
+        self._etags = np.ndarray((n, _ETAG_BYTES), dtype=np.uint8, buffer=self._shm.buf, offset=8 * 4 * (n + 1))
+        if criar:
+            self._cab[:] = 0
+        self._lidos = {}  # cópia do último JPEG lido por este processo, por qualidade
+
+    @property
+    def encerrado(self):
+        return self._cab[0, 0] != 0
+
+    def demandar(self, qualidade):
+        self._cab[NOMES_QUALIDADES.index(qualidade) + 1, 3] = time.time() + DEMANDA_TTL
+
+    def demandado(self, qualidade, agora=None):
+        return self._cab[NOMES_QUALIDADES.index(qualidade) + 1, 3] >= (agora or time.time())
+
+    def publicar(self, qualidade, dados):
+        import numpy as np
+        i = NOMES_QUALIDADES.index(qualidade)
+        if len(dados) > TAMANHO_MAX_JPEG[qualidade]:
+            return False
+        linha = self._cab[i + 1]
+        versao = abs(linha[0]) + 1
+        # ETag calculado uma única vez por frame; frames idênticos geram o mesmo ETag
+        etag = hashlib.blake2b(dados, digest_size=_ETAG_BYTES // 2).hexdigest().encode()
+        linha[0] = -versao
+        self._shm.buf[self._inicio[i]:self._inicio[i] + len(dados)] = dados
+        self._etags[i, :] = np.frombuffer(etag, dtype=np.uint8)
+        linha[1:3] = (len(dados), time.time())
+        linha[0] = versao
+        return True
+
+    # Último JPEG da qualidade: (versao, dados, etag, timestamp) ou None
+    def atual(self, qualidade):
+        i = NOMES_QUALIDADES.index(qualidade)
+        linha = self._cab[i + 1]
+        for _ in range(10):
+            versao = linha[0]
+            if versao == 0:
+                return None
+            lido = self._lidos.get(qualidade)
+            if lido is not None and lido[0] == versao:
+                return lido
+            if versao > 0:
+                tamanho, timestamp = int(linha[1]), float(linha[2])
+                dados = bytes(self._shm.buf[self._inicio[i]:self._inicio[i] + tamanho])
+                etag = self._etags[i].tobytes().decode()
+                if linha[0] == versao:
+                    lido = (int(versao), dados, etag, timestamp)
+                    self._lidos[qualidade] = lido
+                    return lido
+            time.sleep(0.001)
+        return self._lidos.get(qualidade)
+
+    # Espera um frame da qualidade pedida mais novo que apos_versao; retorna (versao, dados, etag, timestamp) ou None.
+    def aguardar(self, qualidade, apos_versao=0, timeout=5.0, espera=0.01):
+        limite = time.time() + timeout
+        while True:
+            frame = self.atual(qualidade)
+            if frame is not None and frame[0] > apos_versao:
+                return frame
+            if time.time() >= limite or self.encerrado:
+                return None
+            time.sleep(espera)
+
+    def fechar(self):
+        import numpy as np
+        if self._dono:
+            self._cab[0, 0] = 1  # avisa quem anexou que este segmento vai sumir
+        # Quem ainda segura este objeto (ex.: um /stream aberto no modo embutido) passa a ver um
+        # canal encerrado e sem frames, em vez de memória que já não existe
+        fechado = np.zeros_like(self._cab)
+        fechado[0, 0] = 1
+        self._cab = fechado
+        del self._etags
+        self._shm.close()
+        if self._dono:
+            self._shm.unlink()